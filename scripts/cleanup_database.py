@@ -5,76 +5,90 @@ Drops all tables and sequences from the real_estate_db to provide a clean slate.
 Use this when restarting the project from scratch.
 """
 
+import json
 import psycopg2
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from load import pooled_connection, close_connection_pools
+from manifest import reset_ingestion
 
-def cleanup_database(db_url: str):
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'sources.json')
+
+
+def cleanup_database(db_url: str, manifest_path: str = None):
     """
     Drop all tables and sequences from the database.
     
     Args:
         db_url: PostgreSQL connection string
+        manifest_path: Ingestion manifest to reset, so unchanged files are loaded again
     """
     print("🧹 Starting database cleanup...")
     
     try:
-        # Connect to the database
-        conn = psycopg2.connect(db_url)
-        conn.autocommit = True
-        cursor = conn.cursor()
+        # Check a connection out of the shared pool (autocommit is reset when it goes back)
+        with pooled_connection(db_url, max_size=1) as conn:
+            conn.autocommit = True
+            cursor = conn.cursor()
         
-        # Get all tables in public schema
-        cursor.execute("""
-            SELECT tablename 
-            FROM pg_tables 
-            WHERE schemaname = 'public'
-            ORDER BY tablename;
-        """)
-        tables = cursor.fetchall()
+            # Get all tables in public schema
+            cursor.execute("""
+                SELECT tablename 
+                FROM pg_tables 
+                WHERE schemaname = 'public'
+                ORDER BY tablename;
+            """)
+            tables = cursor.fetchall()
         
-        if not tables:
-            print("✅ No tables found. Database is already clean.")
-            return
+            if not tables:
+                print("✅ No tables found. Database is already clean.")
+                if manifest_path:
+                    reset_ingestion(manifest_path)
+                return
         
-        print(f"\n📋 Found {len(tables)} table(s) to drop:")
-        for table in tables:
-            print(f"   - {table[0]}")
+            print(f"\n📋 Found {len(tables)} table(s) to drop:")
+            for table in tables:
+                print(f"   - {table[0]}")
         
-        # Drop each table with CASCADE
-        for table in tables:
-            table_name = table[0]
-            print(f"\n🗑️  Dropping table: {table_name}")
-            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE;')
-            print(f"   ✅ Dropped {table_name}")
+            # Drop each table with CASCADE
+            for table in tables:
+                table_name = table[0]
+                print(f"\n🗑️  Dropping table: {table_name}")
+                cursor.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE;')
+                print(f"   ✅ Dropped {table_name}")
         
-        # Get all sequences in public schema
-        cursor.execute("""
-            SELECT sequencename 
-            FROM pg_sequences 
-            WHERE schemaname = 'public'
-            ORDER BY sequencename;
-        """)
-        sequences = cursor.fetchall()
+            # Get all sequences in public schema
+            cursor.execute("""
+                SELECT sequencename 
+                FROM pg_sequences 
+                WHERE schemaname = 'public'
+                ORDER BY sequencename;
+            """)
+            sequences = cursor.fetchall()
         
-        if sequences:
-            print(f"\n📋 Found {len(sequences)} sequence(s) to drop:")
-            for seq in sequences:
-                print(f"   - {seq[0]}")
+            if sequences:
+                print(f"\n📋 Found {len(sequences)} sequence(s) to drop:")
+                for seq in sequences:
+                    print(f"   - {seq[0]}")
             
-            # Drop each sequence
-            for seq in sequences:
-                seq_name = seq[0]
-                print(f"\n🗑️  Dropping sequence: {seq_name}")
-                cursor.execute(f'DROP SEQUENCE IF EXISTS "{seq_name}" CASCADE;')
-                print(f"   ✅ Dropped {seq_name}")
+                # Drop each sequence
+                for seq in sequences:
+                    seq_name = seq[0]
+                    print(f"\n🗑️  Dropping sequence: {seq_name}")
+                    cursor.execute(f'DROP SEQUENCE IF EXISTS "{seq_name}" CASCADE;')
+                    print(f"   ✅ Dropped {seq_name}")
+        
+            cursor.close()
         
-        cursor.close()
-        conn.close()
+        # The manifest only remembers files; without the tables every source has to be loaded again
+        if manifest_path:
+            reset_ingestion(manifest_path)
+            print(f"\n🗑️  Reset ingestion manifest: {manifest_path}")
         
         print("\n" + "="*50)
         print("✅ Database cleanup completed successfully!")
@@ -86,6 +100,8 @@ def cleanup_database(db_url: str):
     except Exception as e:
         print(f"\n❌ Unexpected error: {e}")
         sys.exit(1)
+    finally:
+        close_connection_pools()
 
 
 if __name__ == "__main__":
@@ -102,7 +118,9 @@ if __name__ == "__main__":
     response = input("\n⚠️  Are you sure you want to proceed? (yes/no): ").strip().lower()
     
     if response == "yes":
-        cleanup_database(DB_URL)
+        with open(CONFIG_PATH) as config_file:
+            manifest_path = json.load(config_file)['defaults'].get('manifest_path')
+        cleanup_database(DB_URL, manifest_path)
     else:
         print("\n❌ Cleanup cancelled. No changes made.")
         sys.exit(0)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+
+Builds large versions of data/real_estate.csv for scaling benchmarks, e.g.
+
+    python scripts/generate_synthetic_data.py 1000000 data/synthetic/real_estate_1000000.csv
+
+Rows are resampled from the real feed, so column distributions, null / empty rates,
+placeholder dates like "0" and the correlations between columns are preserved.
+Every row gets a fresh location.id (state prefix + counter) and a share of rows
+re-use an earlier id, matching the duplicate location.id rate of the real file
+(or --duplicate-rate). Output is written in chunks, so 10M rows never sit in memory.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SOURCE_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'real_estate.csv')
+ID_COLUMN = 'location.id'
+STATE_COLUMN = 'location.address.state'
+
+
+def load_profile(source_csv=SOURCE_CSV):
+    # Read everything as text so values are written back exactly as the feed has them
+    real = pd.read_csv(source_csv, dtype=str, keep_default_na=False)
+    duplicate_rate = 1 - real[ID_COLUMN].nunique() / len(real) if len(real) else 0.0
+    return real, duplicate_rate
+
+
+def generate_chunk(real, start, size, duplicate_rate, rng):
+    chunk = real.iloc[rng.integers(0, len(real), size=size)].reset_index(drop=True)
+
+    # Fresh unique ids: state prefix + global row counter
+    counters = pd.Series(np.arange(start, start + size)).astype(str).str.zfill(8)
+    prefix = chunk[STATE_COLUMN].where(chunk[STATE_COLUMN].str.len() > 0, 'XX')
+    ids = (prefix + counters).to_numpy(dtype=object)
+
+    # Re-use an earlier id from the same chunk for a duplicate_rate share of rows
+    if duplicate_rate > 0 and size > 1:
+        duplicate_rows = np.flatnonzero(rng.random(size) < duplicate_rate)
+        duplicate_rows = duplicate_rows[duplicate_rows > 0]
+        ids[duplicate_rows] = ids[rng.integers(0, duplicate_rows)]
+
+    chunk[ID_COLUMN] = ids
+    return chunk
+
+
+def generate(rows, output_path, duplicate_rate=None, chunk_size=500000, seed=42, source_csv=SOURCE_CSV):
+    real, real_duplicate_rate = load_profile(source_csv)
+    if duplicate_rate is None:
+        duplicate_rate = real_duplicate_rate
+    rng = np.random.default_rng(seed)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', newline='') as the_file:
+        for start in range(0, rows, chunk_size):
+            size = min(chunk_size, rows - start)
+            chunk = generate_chunk(real, start, size, duplicate_rate, rng)
+            chunk.to_csv(the_file, index=False, header=(start == 0), quoting=csv.QUOTE_ALL)
+            print(f"  wrote {start + size:,} / {rows:,} rows")
+
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic real estate feed")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output_path')
+    parser.add_argument('--duplicate-rate', type=float, default=None,
+                        help="share of rows re-using an earlier location.id (default: rate in the real file)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"GENERATING {args.rows:,} ROWS → {args.output_path}")
+    print("="*50)
+    generate(args.rows, args.output_path, duplicate_rate=args.duplicate_rate, seed=args.seed)
+    print("✅ Done")
+    sys.exit(0)
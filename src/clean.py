@@ -1,42 +1,59 @@
 # clean.py - Functions to clean and standardize data
 # You'll build this step by step!
 
+import numpy as np
 import pandas as pd
 # import re
 import sys
 import os
+from contextlib import nullcontext
+from functools import partial
 
 # Add parent directory to path for logs import
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import logger
+from metrics import stage
+from dates import parse_dates, log_coerced, MISSING_DATES
+
+# Above this share of distinct values transform_strings works on the rows directly
+MAX_UNIQUE_RATIO = 0.5
+
+# Column names in the feed → database-friendly names
+COLUMN_MAPPING = {
+# Date fields
+    "data.date": "data_date",
+# Property details
+    "data.owned or leased": "ownership_type",
+    "data.parking spaces": "parking_spaces",
+    "data.status": "status",
+    "data.type": "property_type",
+# Location info
+    "location.congressional district": "congressional_district",
+    "location.id": "location_id",
+    "location.region id": "region_id",
+# Accessibility info
+    "data.disabilities.ADA Accessible": "ada_accessible",
+    "data.disabilities.ansi usable": "ansi_usable",
+# Address fields
+    "location.address.city": "city",
+    "location.address.county": "county",
+    "location.address.line 1": "address_line1",
+    "location.address.state": "state",
+    "location.address.zip": "zip_code",
+}
+
+# Placeholder values that mean "no value" (after stripping), per renamed column
+MISSING_PLACEHOLDERS = {'data_date': MISSING_DATES}
+
+# Columns parsed as dates, renamed column → format (None = inferred from the first value)
+DATE_COLUMNS = {'data_date': None}
+
 
 # Function 01
     # Makes names database-friendly(no dots/spaces)
 def rename_columns(df):
-    column_mapping = {
-    # Date fields
-        "data.date": "data_date",
-    # Property details
-        "data.owned or leased": "ownership_type",
-        "data.parking spaces": "parking_spaces",
-        "data.status": "status",
-        "data.type": "property_type",
-    # Location info
-        "location.congressional district": "congressional_district",
-        "location.id": "location_id",
-        "location.region id": "region_id",
-    # Accessibility info
-        "data.disabilities.ADA Accessible": "ada_accessible",
-        "data.disabilities.ansi usable": "ansi_usable",
-    # Address fields
-        "location.address.city": "city",
-        "location.address.county": "county",
-        "location.address.line 1": "address_line1",
-        "location.address.state": "state",
-        "location.address.zip": "zip_code",
-    }
     logger.info(f"✅ Renamed all columns")
-    return df.rename(columns=column_mapping)
+    return df.rename(columns=COLUMN_MAPPING)
 
 
 # Function 02
@@ -45,39 +62,142 @@ def strip_whitespace(df):
     # Loop thru each column
     for col in df.columns:
         # Check if this column contains text (not numbers)
-        if df[col].dtype == "object":
-            # Remove spaces from ALL values in this column
-            df[col] = df[col].str.strip()
+        # (object, string, Arrow-backed string[pyarrow] and categorical text columns)
+        if is_text_column(df[col]):
+            # Strip each distinct value once and rebuild the column from the codes
+            df[col] = transform_strings(df[col], strip_values)
             
     logger.info(f"✅ Stripped whitespace from string columns")
     return df
 
 
+def strip_values(values):
+    return values.str.strip()
+
+
+def is_text_column(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.api.types.is_string_dtype(series.cat.categories.dtype)
+    return pd.api.types.is_string_dtype(series.dtype)
+
+
+# String transform layer
+    # func gets a Series of the column's distinct values and returns them cleaned (e.g. values.str.strip()).
+    # Columns with few distinct values (city, state, status, ...) are cleaned per unique instead of per row.
+    # Categorical columns transform their categories and stay categorical; as_category=True makes any column categorical.
+    # Values the function maps together (" CT" and "CT") end up as one value/category.
+def transform_strings(series, func, as_category=False):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = pd.Series(series.cat.categories)
+        as_category = True
+    else:
+        codes, uniques = series.array.factorize()
+        # Mostly-unique columns (ids, addresses): one pass over the rows is cheaper than rebuilding them
+        if not as_category and len(uniques) > len(series) * MAX_UNIQUE_RATIO:
+            return func(series)
+        uniques = pd.Series(uniques)
+    
+    cleaned = func(uniques)
+    
+    if as_category:
+        # Re-factorize the cleaned values so categories stay unique, then remap the codes (-1 stays missing)
+        cleaned_codes, categories = pd.factorize(cleaned)
+        codes = np.append(cleaned_codes, -1)[codes]
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=series.index, name=series.name)
+    
+    return pd.Series(cleaned.array.take(codes, allow_fill=True), index=series.index, name=series.name)
+
+
 # Function 03 
     # Coverts fake values like 0 to proper NULL
 def handle_missing_values(df):
-    # Check if data_name column exists (after renaming)
-    if 'data_date' in df.columns:
-        # Replace the string "0" with None (Python's NULL)
-        df['data_date'] = df['data_date'].replace('0', None)
+    for col, placeholders in MISSING_PLACEHOLDERS.items():
+        # Check if the column exists (after renaming)
+        if col in df.columns:
+            # Replace the string "0" with None (Python's NULL)
+            df[col] = df[col].replace(placeholders, None)
         
     logger.info(f"✅ Handled missing values")
     return df
 
-# Function 03
-
-def convert_date_format(df):
+# Function 04
+    # Parses data_date with the source's explicit format (date_format), once per distinct value
+def convert_date_format(df, date_format=None):
     if 'data_date' in df.columns:
-        df['data_date'] = pd.to_datetime(
-            df['data_date'],
-            errors='coerce'
-        )
+        df['data_date'], coerced = parse_dates(df['data_date'], date_format)
+        log_coerced('data_date', coerced)
         
         null_count = df['data_date'].isna().sum()
         valid_count = df['data_date'].notna().sum()
         logger.info(f"✅ Coverted data_date format: {valid_count} valid, {null_count} null")
     return df
 
+
+# Function 05: Clean plan
+    # rename → strip → placeholder-to-NULL → date parsing, applied column by column in one pass.
+    # Text steps run once per distinct value (transform_strings); the cleaned columns are put
+    # together into one new frame at the end instead of four intermediate frames.
+class CleanPlan:
+    def __init__(self, rename, strip=True, placeholders=None, dates=None, column_timing=False):
+        self.rename = rename
+        self.strip = strip
+        self.placeholders = placeholders or {}
+        self.dates = dates or {}
+        # Records a clean.column.<name> stage per column
+        self.column_timing = column_timing
+    
+    def apply(self, df):
+        columns = {}
+        for source_col in df.columns:
+            col = self.rename.get(source_col, source_col)
+            timing = stage(f'clean.column.{col}', rows=len(df)) if self.column_timing else nullcontext()
+            with timing:
+                columns[col] = self.clean_column(df[source_col], col)
+        
+        logger.info(f"✅ Cleaned {len(columns)} columns (rename, strip, missing values, dates) in one pass")
+        return pd.DataFrame(columns, index=df.index, copy=False)
+    
+    def clean_column(self, series, col):
+        series = series.rename(col)
+        placeholders = self.placeholders.get(col)
+        if is_text_column(series) and (self.strip or placeholders):
+            series = transform_strings(series, partial(clean_values, strip=self.strip, placeholders=placeholders))
+        
+        if col in self.dates:
+            series, coerced = parse_dates(series, self.dates[col])
+            log_coerced(col, coerced)
+        return series
+
+
+def clean_values(values, strip=True, placeholders=None):
+    if strip:
+        values = values.str.strip()
+    if placeholders:
+        values = values.mask(values.isin(placeholders))
+    return values
+
+
+# Builds the clean plan for a source
+    # source "clean": {"rename": {...}, "strip": true, "placeholders": {"col": ["0"]}, "dates": {"col": "%Y.%m.%d"}}
+    # extends the built-in mapping/placeholders/dates; defaults.metrics.clean_columns turns on per-column timing
+def compile_clean_plan(source_config=None, defaults=None):
+    source_config = source_config or {}
+    clean = source_config.get('clean', {})
+    
+    dates = {**DATE_COLUMNS, **clean.get('dates', {})}
+    if source_config.get('date_format'):
+        dates['data_date'] = source_config['date_format']
+    
+    return CleanPlan(
+        rename={**COLUMN_MAPPING, **clean.get('rename', {})},
+        strip=clean.get('strip', True),
+        placeholders={**MISSING_PLACEHOLDERS, **clean.get('placeholders', {})},
+        dates=dates,
+        column_timing=(defaults or {}).get('metrics', {}).get('clean_columns', False)
+    )
+
+
 if __name__=="__main__": # pragma: no cover
     # Import the CSV reader
     import sys
@@ -0,0 +1,168 @@
+# executor.py - Runs pipeline stages concurrently over a stream of chunks
+'''
+    extract ──queue──▶ transform ──queue──▶ load
+
+Every stage runs in its own thread and hands its output to the next one through a
+bounded queue. While chunk N is being loaded, chunk N+1 is being cleaned/validated
+and chunk N+2 parsed. When the loader falls behind the queues fill up and the
+upstream stages block (backpressure), so at most queue_size chunks wait between
+two stages and memory stays bounded.
+
+Each stage keeps chunks in order (one thread per stage). For every stage we measure:
+
+    busy_seconds     time spent doing the work
+    starved_seconds  time waiting for input (upstream too slow)
+    blocked_seconds  time waiting for room in the output queue (downstream too slow)
+    utilisation      busy_seconds / wall time of the whole pipeline
+
+The first error in any stage stops every stage and is raised to the caller.
+'''
+
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils import logger
+
+# How often a blocked stage checks whether another stage has failed
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def to_dict(self, wall_seconds):
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 6),
+            'starved_seconds': round(self.starved_seconds, 6),
+            'blocked_seconds': round(self.blocked_seconds, 6),
+            'utilisation': round(self.busy_seconds / wall_seconds, 3) if wall_seconds > 0 else 0.0
+        }
+
+
+class _Stopped(Exception):
+    pass
+
+
+# Function 01: Run chunks through steps = [(name, func), ...] with bounded queues between them
+    # func(item) returns the item for the next step; the last step's return value is ignored
+def run_pipelined(chunks, steps, queue_size=2, source_name='extract'):
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in steps]
+    stats = [StageStats(source_name)] + [StageStats(name) for name, _ in steps]
+
+    def put(target, item, stage_stats):
+        waited = time.perf_counter()
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                target.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        stage_stats.blocked_seconds += time.perf_counter() - waited
+
+    def get(source, stage_stats):
+        waited = time.perf_counter()
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                item = source.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        stage_stats.starved_seconds += time.perf_counter() - waited
+        return item
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def produce():
+        stage_stats = stats[0]
+        iterator = iter(chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                item = next(iterator, _DONE)
+                stage_stats.busy_seconds += time.perf_counter() - started
+                if item is _DONE:
+                    break
+                stage_stats.items += 1
+                put(queues[0], item, stage_stats)
+            put(queues[0], _DONE, stage_stats)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            fail(e)
+        finally:
+            # Lets a generator close its file when the pipeline stops early
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def consume(index, func):
+        stage_stats = stats[index + 1]
+        output = queues[index + 1] if index + 1 < len(steps) else None
+        try:
+            while True:
+                item = get(queues[index], stage_stats)
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                result = func(item)
+                stage_stats.busy_seconds += time.perf_counter() - started
+                stage_stats.items += 1
+                if output is not None:
+                    put(output, result, stage_stats)
+            if output is not None:
+                put(output, _DONE, stage_stats)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    threads = [threading.Thread(target=produce, name=f"pipeline-{source_name}", daemon=True)]
+    threads += [threading.Thread(target=consume, args=(index, func), name=f"pipeline-{name}", daemon=True)
+                for index, (name, func) in enumerate(steps)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    if errors:
+        raise errors[0]
+
+    report = [stage_stats.to_dict(wall_seconds) for stage_stats in stats]
+    log_utilisation(report, wall_seconds)
+    return report
+
+
+def log_utilisation(report, wall_seconds):
+    logger.info(f" Pipeline finished in {wall_seconds:.2f}s")
+    for record in report:
+        logger.info(f"   {record['stage']:<10} {record['items']:>5} chunks  busy {record['utilisation']:>6.1%}  "
+                    f"starved {record['starved_seconds']:>7.2f}s  blocked {record['blocked_seconds']:>7.2f}s")
+
+
+'''executor.py overlaps extract, transform and load: each stage runs in
+its own thread, connected by bounded queues that give backpressure, and
+reports how busy each stage was.'''
@@ -2,14 +2,21 @@
 # You'll build this step by step!
 
 import psycopg2
+import numpy as np
 import pandas as pd
 from psycopg2 import sql
-import json
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from contextlib import contextmanager
+import io
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import logger
+from metrics import stage
 
 # Function 01: Create the database schema
 def create_tables(conn):
@@ -33,10 +40,16 @@ def create_tables(conn):
         address_line1 VARCHAR(200),
         state VARCHAR(5),
         zip_code VARCHAR(15),
+        row_hash BIGINT,
         created_at TIMESTAMP DEFAULT NOW()
     );
     """
     
+    # Tables created before row hashing get the column added
+    add_row_hash_column = """
+    ALTER TABLE stg_real_estate ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+    """
+    
     # TABLE 2: Reject table for invalid data
     create_stg_rejects = """
     CREATE TABLE IF NOT EXISTS stg_rejects (
@@ -80,6 +93,7 @@ def create_tables(conn):
     
     try:
         cursor.execute(create_stg_real_estate)
+        cursor.execute(add_row_hash_column)
         cursor.execute(create_stg_rejects)
         cursor.execute(create_rejects_view)
         cursor.execute(grant_view_permissions)
@@ -105,45 +119,40 @@ def get_db_connection(db_url):
         raise
 
 # Function 03: Load valid data using UPSERT
-def load_to_staging(conn, df, table_name, pk_column, batch_size=1000):
+    # method='row' sends one UPSERT per row, method='values' one multi-row UPSERT per page,
+    # method='copy' streams each batch with COPY
+    # Rows whose row_hash matches the stored one are left alone; pass stats={} to get
+    # inserted / updated / unchanged counts back (they are added to what is already there)
+def load_to_staging(conn, df, table_name, pk_column, batch_size=1000, method='row', page_size=None, stats=None):
+    if method == 'copy':
+        return copy_to_staging(conn, df, table_name, pk_column, batch_size, stats)
+    if method == 'values':
+        return values_to_staging(conn, df, table_name, pk_column, batch_size, page_size, stats)
+    if method != 'row':
+        raise ValueError(f"Unknown load method: {method}")
+    
     cursor = conn.cursor()
-    columns = df.columns.tolist()
+    columns = df.columns.tolist() + ['row_hash']
     
     placeholders = ', '.join(['%s'] * len(columns))
-    columns_str = ', '.join(columns)
-    
-    update_cols = [col for col in columns if col != pk_column]
-    update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in update_cols])
-    
-    upsert_query = f"""
-        INSERT INTO {table_name} ({columns_str})
-        VALUES ({placeholders})
-        ON CONFLICT ({pk_column}) DO UPDATE SET
-        {update_str}
-    """
+    query = upsert_query(table_name, columns, pk_column, f"VALUES ({placeholders})")
     
     try: 
         total_rows = 0
+        counts = {'inserted': 0, 'updated': 0}
         
         for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
+            batch = with_row_hash(df.iloc[i:i+batch_size])
             
-            for _, row in batch.iterrows():
-                
-                values = []
-                for col in columns:
-                    val = row[col]
-                    
-                    if pd.isna(val):
-                        values.append(None)
-                    else:
-                        values.append(val)
-                cursor.execute(upsert_query, values)
-                total_rows += 1
-            conn.commit()
+            with stage('load.batch', rows=len(batch), method='row'):
+                for values in encode_rows(batch):
+                    cursor.execute(query, values)
+                    add_counts(counts, [cursor.fetchone()])
+                    total_rows += 1
+                conn.commit()
             logger.info(f" Loaded batch: {min(i+batch_size, len(df))}")
         
-        logger.info(f"Successfully loaded {total_rows} rows to {table_name}")
+        report_counts(table_name, total_rows, counts, stats)
         return total_rows
     
     except Exception as e:
@@ -155,10 +164,15 @@ def load_to_staging(conn, df, table_name, pk_column, batch_size=1000):
         
 
 # Function 04: Load rejected records with reasons
-def load_rejected(conn, rejected_df, source_name):
-    if len(rejected_df) == 0:
+    # method='copy' streams each page of rejects into stg_rejects with COPY,
+    # 'values' sends page_size rejects per INSERT statement, 'row' one INSERT per reject
+    # rejected is a validate.RejectSet (rows are materialised page_size at a time) or a DataFrame with rejection_reason
+def load_rejected(conn, rejected, source_name, method='row', page_size=1000):
+    if len(rejected) == 0:
         logger.info("No rejecet records to load")
         return 0
+    if method not in ('row', 'values', 'copy'):
+        raise ValueError(f"Unknown load method: {method}")
     
     cursor = conn.cursor()
     
@@ -168,25 +182,415 @@ def load_rejected(conn, rejected_df, source_name):
     """
     
     try: 
-        for _, row in rejected_df.iterrows():
-            row_dict = row.drop('rejection_reason').to_dict()
-            raw_data_json = json.dumps(row_dict, default=str)
+        for start in range(0, len(rejected), page_size):
+            rejected_df = reject_page(rejected, start, start + page_size)
+            raw_data = to_json_lines(rejected_df.drop(columns=['rejection_reason']))
+            # Same 0..n-1 index as raw_data, so the COPY columns below line up by position
+            reasons = rejected_df['rejection_reason'].astype(str).reset_index(drop=True)
             
-            cursor.execute(insert_query, (
-                source_name,
-                raw_data_json,
-                row['rejection_reason']
-            ))
+            if method == 'copy':
+                copy_query = "COPY stg_rejects (source_name, raw_data, rejection_reason) FROM STDIN"
+                lines = copy_escape(pd.Series(source_name, index=raw_data.index)).str.cat(
+                    [copy_escape(raw_data), copy_escape(reasons)], sep='\t')
+                cursor.copy_expert(copy_query, io.StringIO('\n'.join(lines) + '\n'))
+            elif method == 'values':
+                values_query = "INSERT INTO stg_rejects (source_name, raw_data, rejection_reason) VALUES %s"
+                rows = [(source_name, data, reason) for data, reason in zip(raw_data, reasons)]
+                execute_values(cursor, values_query, rows, page_size=page_size)
+            else:
+                for data, reason in zip(raw_data, reasons):
+                    cursor.execute(insert_query, (source_name, data, reason))
         conn.commit()
-        logger.info(f"Loaded {len(rejected_df)} rejected to stg_rejects")
-        return len(rejected_df)
+        logger.info(f"Loaded {len(rejected)} rejected to stg_rejects")
+        return len(rejected)
     except Exception as e:
         conn.rollback()
         logger.error(f"Error Loading rejects: {e}")
         raise
     finally:
         cursor.close()
+
+
+def reject_page(rejected, start, stop):
+    if isinstance(rejected, pd.DataFrame):
+        return rejected.iloc[start:stop]
+    return rejected.to_frame(start, stop)
+
+
+# Helper: One JSON object per row from a single to_json call (dates as ISO strings, NaN/NaT as null)
+def to_json_lines(df):
+    if len(df) == 0:
+        return pd.Series([], dtype=object)
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        df[col] = integral_floats_as_int(df[col])
+    
+    text = df.to_json(orient='records', lines=True, date_format='iso', date_unit='s', default_handler=str)
+    # JSON escapes newlines inside strings, so every line is one record
+    return pd.Series(text.rstrip('\n').split('\n'), dtype=object)
+        
+
+# Function 05: Bulk load valid data with COPY into a temp table + one merge per batch
+def copy_to_staging(conn, df, table_name, pk_column, batch_size=1000, stats=None):
+    if len(df) == 0:
+        report_counts(table_name, 0, {'inserted': 0, 'updated': 0}, stats)
+        return 0
+    
+    cursor = conn.cursor()
+    columns = df.columns.tolist() + ['row_hash']
+    columns_str = ', '.join(columns)
+    temp_table = f"tmp_{table_name}"
+    
+    # Temp table lives for the session and is emptied on every commit
+    create_temp_query = f"""
+        CREATE TEMP TABLE IF NOT EXISTS {temp_table}
+        (LIKE {table_name} INCLUDING DEFAULTS)
+        ON COMMIT DELETE ROWS
+    """
+    copy_query = f"COPY {temp_table} ({columns_str}) FROM STDIN"
+    merge_query = upsert_query(table_name, columns, pk_column, f"SELECT {columns_str} FROM {temp_table}")
+    
+    # One INSERT ... ON CONFLICT cannot touch the same key twice,
+    # so keep the last occurrence just like row-by-row upserts would
+    df = df.drop_duplicates(subset=[pk_column], keep='last')
+    
+    try:
+        total_rows = 0
+        counts = {'inserted': 0, 'updated': 0}
+        
+        for i in range(0, len(df), batch_size):
+            batch = df.iloc[i:i+batch_size]
+            
+            with stage('load.batch', rows=len(batch), method='copy'):
+                # The hash is taken from the same text COPY sends, so it is only built once
+                lines = to_copy_lines(batch)
+                lines = lines + '\t' + pd.Series(row_hashes(lines), index=lines.index).astype(str)
+                
+                cursor.execute(create_temp_query)
+                cursor.copy_expert(copy_query, io.StringIO('\n'.join(lines) + '\n'))
+                cursor.execute(merge_query)
+                add_counts(counts, [cursor.fetchone()])
+                conn.commit()
+            
+            total_rows += len(batch)
+            logger.info(f" Copied batch: {min(i+batch_size, len(df))}")
+        
+        report_counts(table_name, total_rows, counts, stats)
+        return total_rows
+    
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error loading data: {e}")
+        raise
+    finally:
+        cursor.close()
+
+
+# Helper: Serialize a DataFrame into COPY text format (tab separated, \N for NULL)
+def to_copy_buffer(df):
+    return io.StringIO('\n'.join(to_copy_lines(df)) + '\n')
+
+
+# Helper: One COPY text line per row
+def to_copy_lines(df):
+    text_columns = []
+    for col in df.columns:
+        series = integral_floats_as_int(df[col])
+        text_columns.append(copy_escape(series.astype(str)).where(series.notna(), '\\N'))
+    
+    return text_columns[0].str.cat(text_columns[1:], sep='\t')
+
+
+# Helper: Escape backslashes and line/field separators for COPY text format
+def copy_escape(text):
+    return (text.str.replace('\\', '\\\\', regex=False)
+                .str.replace('\t', '\\t', regex=False)
+                .str.replace('\n', '\\n', regex=False)
+                .str.replace('\r', '\\r', regex=False))
+
+
+# Helper: Integer columns turn into floats once they hold NaN; write them back as integers
+def integral_floats_as_int(series):
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        return series.astype('Int64')
+    return series
+
+
+# Helper: Content hash per row (signed 64-bit, fits a BIGINT), taken from the COPY text
+    # so the same values hash the same whatever dtype they were read with
+def row_hashes(lines):
+    return pd.util.hash_pandas_object(lines, index=False).to_numpy().view('int64')
+
+
+def with_row_hash(df):
+    if len(df) == 0:
+        return df.assign(row_hash=pd.Series(dtype='int64'))
+    return df.assign(row_hash=row_hashes(to_copy_lines(df)))
+
+
+# Helper: INSERT ... ON CONFLICT DO UPDATE that skips rows whose row_hash did not change
+    # and answers with a single (inserted, updated) row; xmax = 0 only for freshly inserted rows
+def upsert_query(table_name, columns, pk_column, rows_sql):
+    columns_str = ', '.join(columns)
+    update_cols = [col for col in columns if col != pk_column]
+    update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in update_cols])
+    
+    return f"""
+        WITH merged AS (
+            INSERT INTO {table_name} ({columns_str})
+            {rows_sql}
+            ON CONFLICT ({pk_column}) DO UPDATE SET
+            {update_str}
+            WHERE {table_name}.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged
+    """
+
+
+def add_counts(counts, results):
+    for inserted, updated in results:
+        counts['inserted'] += inserted
+        counts['updated'] += updated
+
+
+def report_counts(table_name, total_rows, counts, stats=None):
+    counts = dict(counts, unchanged=total_rows - counts['inserted'] - counts['updated'])
+    if stats is not None:
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+    logger.info(f"Successfully loaded {total_rows} rows to {table_name}: {counts['inserted']} inserted, "
+                f"{counts['updated']} updated, {counts['unchanged']} unchanged")
+
+
+# Function 06: Load valid data with multi-row INSERT ... VALUES (...), (...) ON CONFLICT statements
+    # Fallback for databases where COPY is not allowed: page_size rows per statement, one commit per batch
+def values_to_staging(conn, df, table_name, pk_column, batch_size=1000, page_size=None, stats=None):
+    if len(df) == 0:
+        report_counts(table_name, 0, {'inserted': 0, 'updated': 0}, stats)
+        return 0
+    
+    cursor = conn.cursor()
+    columns = df.columns.tolist() + ['row_hash']
+    page_size = page_size or batch_size
+    query = upsert_query(table_name, columns, pk_column, "VALUES %s")
+    
+    # A multi-row INSERT ... ON CONFLICT cannot touch the same key twice either
+    df = df.drop_duplicates(subset=[pk_column], keep='last')
+    
+    try:
+        total_rows = 0
+        counts = {'inserted': 0, 'updated': 0}
+        
+        for i in range(0, len(df), batch_size):
+            batch = with_row_hash(df.iloc[i:i+batch_size])
+            
+            with stage('load.batch', rows=len(batch), method='values'):
+                # fetch=True collects the (inserted, updated) row of every page
+                results = execute_values(cursor, query, encode_rows(batch), page_size=page_size, fetch=True)
+                add_counts(counts, results)
+                conn.commit()
+            
+            total_rows += len(batch)
+            logger.info(f" Loaded batch: {min(i+batch_size, len(df))}")
+        
+        report_counts(table_name, total_rows, counts, stats)
+        return total_rows
+    
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error loading data: {e}")
+        raise
+    finally:
+        cursor.close()
+
+
+# Helper: Encode a batch as tuples of plain Python values psycopg2 can adapt (None for NaN / NaT / NA)
+    # Works column by column on whole arrays; there is no per-cell pandas call left in the loaders
+def encode_rows(df):
+    columns = [encode_column(df[col]) for col in df.columns]
+    return list(zip(*columns)) if columns else [() for _ in range(len(df))]
+
+
+def encode_column(series):
+    missing = series.isna().to_numpy()
+    dtype = series.dtype
+    
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Look the category up once per code instead of once per row
+        categories = np.append(np.asarray(dtype.categories, dtype=object), None)
+        return categories[series.cat.codes.to_numpy()].tolist()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = pd.DatetimeIndex(series).to_pydatetime()
+    elif isinstance(dtype, np.dtype):
+        values = series.to_numpy()
+        # Integer columns turn into floats once they hold NaN; send them back as integers
+        if dtype.kind == 'f' and missing.any() and (values[~missing] % 1 == 0).all():
+            values = series.astype('Int64').to_numpy(dtype=object, na_value=None)
+    else:
+        # Nullable / Arrow extension arrays box straight to Python scalars
+        return series.to_numpy(dtype=object, na_value=None).tolist()
+    
+    if missing.any():
+        values = values.astype(object)
+        values[missing] = None
+    # tolist() turns numpy scalars into int / float / bool / str
+    return values.tolist()
+
+
+# Function 07: Pooled connections, shared by every source, stage and load worker in a process
+class ConnectionPool:
+    def __init__(self, db_url, min_size=1, max_size=10, timeout=30):
+        try:
+            self._pool = ThreadedConnectionPool(min_size, max_size, db_url)
+        except Exception as e:
+            logger.error(f"Database connection failed: {e}")
+            raise
+        # getconn() raises as soon as the pool is exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+    
+    @contextmanager
+    def connection(self):
+        with stage('load.connect'):
+            if not self._slots.acquire(timeout=self.timeout):
+                raise PoolError(f"No pooled connection free after {self.timeout}s (max_size={self.max_size})")
+            try:
+                conn = self._checkout()
+            except Exception:
+                self._slots.release()
+                raise
         
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+            self._slots.release()
+    
+    def _checkout(self):
+        conn = self._pool.getconn()
+        if is_healthy(conn):
+            return conn
+        # The server dropped it (restart, idle timeout, ...): replace it with a fresh one
+        logger.warning("Discarding a broken pooled connection")
+        self._pool.putconn(conn, close=True)
+        return self._pool.getconn()
+    
+    def _checkin(self, conn):
+        # Hand the connection back clean: no open transaction, default session settings
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                broken = True
+        self._pool.putconn(conn, close=broken)
+    
+    def close(self):
+        self._pool.closeall()
+
+
+def is_healthy(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# One pool per database per process: psycopg2 connections cannot cross a fork
+def get_connection_pool(db_url, min_size=1, max_size=10, timeout=30):
+    key = (os.getpid(), db_url)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_url, min_size, max_size, timeout)
+            logger.info(f"Connection pool ready (min {min_size}, max {max_size} connections)")
+        return _pools[key]
+
+
+# with pooled_connection(db_url) as conn: ...  checks a healthy connection out and always returns it
+@contextmanager
+def pooled_connection(db_url, min_size=1, max_size=10, timeout=30):
+    with get_connection_pool(db_url, min_size, max_size, timeout).connection() as conn:
+        yield conn
+
+
+def close_connection_pools():
+    with _pools_lock:
+        for key in [key for key in _pools if key[0] == os.getpid()]:
+            _pools.pop(key).close()
+
+
+# Function 08: Load valid data over several pooled connections at once
+    # Rows are hash-partitioned on pk_column, so every key lands in exactly one shard
+    # and concurrent upserts never touch the same row
+def load_partitioned(db_url, df, table_name, pk_column, workers=4, pool=None,
+                     batch_size=1000, method='copy', page_size=None, stats=None):
+    # Small frames are not worth splitting: at most one shard per batch
+    shard_count = max(1, min(workers, -(-len(df) // batch_size)))
+    shards = partition_frame(df, pk_column, shard_count)
+    
+    # One counts dict per shard, summed at the end, so threads never share one
+    shard_stats = [{} for _ in shards]
+    
+    def load_shard(shard_id, shard):
+        with pooled_connection(db_url, **(pool or {})) as conn:
+            with stage('load.shard', rows=len(shard), shard=shard_id, method=method) as record:
+                loaded = load_to_staging(conn, shard, table_name, pk_column, batch_size=batch_size,
+                                         method=method, page_size=page_size, stats=shard_stats[shard_id])
+        logger.info(f" Shard {shard_id}: {loaded} rows in {record['wall_seconds']:.2f}s "
+                    f"({record.get('rows_per_sec', 0):,.0f} rows/s)")
+        return loaded
+    
+    logger.info(f" Loading {len(df)} rows to {table_name} in {shard_count} parallel shard(s)")
+    with ThreadPoolExecutor(max_workers=shard_count) as executor:
+        futures = [executor.submit(load_shard, shard_id, shard) for shard_id, shard in enumerate(shards)]
+        # Wait for every shard before raising, so no load is left running behind the error
+        errors = [future.exception() for future in futures]
+    
+    failed = [error for error in errors if error is not None]
+    if failed:
+        logger.error(f"{len(failed)} of {shard_count} shard(s) failed to load")
+        raise failed[0]
+    
+    total_rows = sum(future.result() for future in futures)
+    if stats is not None:
+        for counts in shard_stats:
+            for key, value in counts.items():
+                stats[key] = stats.get(key, 0) + value
+    logger.info(f"Successfully loaded {total_rows} rows to {table_name}")
+    return total_rows
+
+
+# Helper: Split a frame into shard_count disjoint frames by the hash of pk_column (row order kept)
+def partition_frame(df, pk_column, shard_count):
+    if shard_count <= 1:
+        return [df]
+    hashes = pd.util.hash_pandas_object(df[pk_column], index=False).to_numpy()
+    shard_ids = hashes % np.uint64(shard_count)
+    return [df[shard_ids == shard_id] for shard_id in range(shard_count)]
+
+
+# Function 09: The pk_column values of df that are already in table_name (one query per call)
+def existing_keys(conn, df, table_name, pk_column):
+    keys = df[pk_column].dropna().unique().tolist()
+    if not keys:
+        return set()
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT {pk_column} FROM {table_name} WHERE {pk_column} = ANY(%s)", (keys,))
+        return {row[0] for row in cursor.fetchall()}
+
 
 # TEST
 if __name__=="__main__": # pragma: no cover
@@ -218,18 +622,18 @@ if __name__=="__main__": # pragma: no cover
     valid_df, rejected_df = apply_all_validations(df, primary_key='location_id')
     
     print("\n Step 3: Connecting to Database...")
-    conn = get_db_connection(DB_URL)
+    with pooled_connection(DB_URL) as conn:
     
-    print("\n Step 4: Creating Tables...")
-    create_tables(conn)
-    
-    print("\n Step 5: Loading Valid Data...")
-    load_to_staging(conn, valid_df, 'stg_real_estate', 'location_id', batch_size=1000)
-    
-    print("\n Step 6: Loading Rejected Data...")
-    load_rejected(conn, rejected_df, 'real_estate_csv')
+        print("\n Step 4: Creating Tables...")
+        create_tables(conn)
+        
+        print("\n Step 5: Loading Valid Data...")
+        load_to_staging(conn, valid_df, 'stg_real_estate', 'location_id', batch_size=1000)
+        
+        print("\n Step 6: Loading Rejected Data...")
+        load_rejected(conn, rejected_df, 'real_estate_csv')
     
-    conn.close()
+    close_connection_pools()
     
     print("\n" + "="*60)
     print("ETL PIPELINE COMPLETE!")
@@ -3,14 +3,29 @@
 
 import sys
 import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from readers.csv_read import read_csv
-from clean import rename_columns, strip_whitespace, handle_missing_values, convert_date_format
+from readers.json_reader import read_json
+from readers.api_reader import read_api
+from clean import compile_clean_plan
+from compact import compact_frame
 from rules import apply_all_validations
-from load import get_db_connection, create_tables, load_to_staging, load_rejected
+from validate import validation_plan
+from load import pooled_connection, close_connection_pools, create_tables, load_to_staging, load_partitioned, load_rejected
+from load import existing_keys
 from config import load_config
-from utils import logger
+from manifest import IngestionPlan, plan_ingestion, record_ingestion, ingestion_target, SKIP, TAIL, FULL
+from readers.json_reader import is_json_array
+from utils import logger, configure_logging
+import metrics
+from metrics import stage, timed, timed_chunks
+from executor import run_pipelined
 
 def run_pipeline(config_path="config/sources.json"):
+    report = metrics.start_run()
+    results = []
     try: 
         
         logger.info("="*70)
@@ -19,70 +34,26 @@ def run_pipeline(config_path="config/sources.json"):
         
         # Load Config
         logger.info("\n[1/5] Loading configuration...")
-        config = load_config(config_path)
-        source_config = config['sources'][0]
+        with stage('config'):
+            config = load_config(config_path)
+        sources = disable_shared_tails(config['sources'])
         defaults = config['defaults']
-        
-        file_path = source_config['path']
-        primary_key = source_config.get('primary_key', 'location_id')
-        db_url = defaults['db_url']
+        configure_logging(**logging_options(defaults))
+        if defaults.get('metrics', {}).get('trace_memory'):
+            metrics.enable_trace_memory()
         
         logger.info(f" Configuration loaded")
-        logger.info(f" Source: {file_path}")
-        logger.info(f" Database: {source_config['target_table']}")
-        
-        # Extract
-        logger.info("\n[2/5] Extracting Data...")
-        df = read_csv(file_path)
-        logger.info(f" Extracted {len(df)} rows")
-        
-        # Tranform - Clean Data
-        logger.info("\n[3/5] Transform Data...")
-        df = rename_columns(df)
-        df = strip_whitespace(df)
-        df = handle_missing_values(df)
-        df = convert_date_format(df)
-        logger.info(f" Cleaned {len(df)} rows")
-        
-        # Transfor - Valid Data
-        logger.info("\n[4/5] Validating Data...")
-        vaild_df, rejected_df = apply_all_validations(df, primary_key=primary_key)
-        logger.info(f" Validating Complete: {len(vaild_df)} valid, {len(rejected_df)} rejected")
-        
-        # Load to Database
-        logger.info("\n[5/5] Loading to database...")
-        conn = get_db_connection(db_url)
-        
-        try:
-            
-            create_tables(conn)
-            
-            valid_count = load_to_staging(
-                conn,
-                vaild_df,
-                table_name=source_config['target_table'],
-                pk_column=primary_key,
-                batch_size=defaults['batch_size']
-            )
-            
-            rejected_count = load_rejected(
-                conn,
-                rejected_df,
-                source_name=source_config['name']
-            )
-            
-            logger.info(f" Loaded {valid_count} valid records")
-            logger.info(f" Loaded {rejected_count} rejected records")
-        finally:
-            conn.close()
-            
-        logger.info("\n" + "="*70)
-        logger.info("ETL PIPELINE COMPLETE ✅")
-        logger.info("="*70)
-        logger.info(f"Total records processed: {len(df)}")
-        logger.info(f"Valid records loaded: {valid_count}")
-        logger.info(f"Rejected records logged: {rejected_count}")
-        logger.info(f"Success rate: {(valid_count/len(df)*100):.1f}%")
+        logger.info(f" Sources: {', '.join(source['name'] for source in sources)}")
+        
+        results = run_all_sources(sources, defaults, defaults.get('max_workers', 1))
+        log_source_results(results)
+        
+        failed = [result['source'] for result in results if result['status'] == 'failed']
+        if failed:
+            raise RuntimeError(f"{len(failed)} source(s) failed: {', '.join(failed)}")
+        
+        valid_count = sum(result['valid'] for result in results)
+        rejected_count = sum(result['rejected'] for result in results)
         
         return valid_count, rejected_count
     except Exception as e:
@@ -91,6 +62,444 @@ def run_pipeline(config_path="config/sources.json"):
         logger.error("="*70)
         logger.error(f"Error: {str(e)}")
         sys.exit(1)
+    finally:
+        # JSON run report next to logs/pipeline.log, written even when the run fails
+        close_connection_pools()
+        metrics.finish_run()
+        report.extra['config_path'] = config_path
+        report.extra['sources'] = results
+        metrics.log_report(report)
+        logger.info(f" Run report: {report.write()}")
+
+
+# Tail mode treats keys already in the target table as loaded earlier from the same file, which only
+    # holds when no other source writes to that table; sources sharing a table are reloaded in full instead
+def disable_shared_tails(sources):
+    tables = Counter(source.get('target_table') for source in sources)
+    checked = []
+    for source in sources:
+        if tables[source.get('target_table')] > 1 and source.get('tail', True):
+            logger.warning(f"⚠️ {source['name']}: {source['target_table']} is shared with other sources; "
+                           f"appended rows reload the whole file")
+            source = {**source, 'tail': False}
+        checked.append(source)
+    return checked
+
+
+# Runs every configured source; independent sources run concurrently in a process pool
+def run_all_sources(sources, defaults, max_workers):
+    if max_workers <= 1 or len(sources) <= 1:
+        return [run_source_safely(source_config, defaults) for source_config in sources]
+    
+    max_workers = min(max_workers, len(sources))
+    logger.info(f"\n Running {len(sources)} sources with {max_workers} worker processes")
+    
+    trace_memory = defaults.get('metrics', {}).get('trace_memory', False)
+    # Workers report under the parent's run id (stage records, manifest entries)
+    report = metrics.active_report()
+    run_id = report.run_id if report else None
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_source_in_worker, source_config, defaults, trace_memory, run_id)
+                   for source_config in sources]
+        results = []
+        for source_config, future in zip(sources, futures):
+            try:
+                result = future.result()
+                # Stage timings measured inside the worker process
+                metrics.merge_stages(result.pop('stages', []))
+                results.append(result)
+            except Exception as e:
+                results.append(failed_result(source_config, e))
+    return results
+
+
+# Entry point inside a worker process: collects that process's stage timings for the parent
+def run_source_in_worker(source_config, defaults, trace_memory=False, run_id=None):
+    # Workers started without fork import utils afresh and need the configured levels again
+    configure_logging(**logging_options(defaults))
+    metrics.start_run(trace_memory=trace_memory, run_id=run_id)
+    try:
+        result = run_source_safely(source_config, defaults)
+    finally:
+        # The worker's pool dies with the process; close its connections cleanly first
+        close_connection_pools()
+    result['stages'] = metrics.finish_run().stages
+    return result
+
+
+def run_source_safely(source_config, defaults):
+    try:
+        return run_source(source_config, defaults)
+    except Exception as e:
+        return failed_result(source_config, e)
+
+
+def failed_result(source_config, error):
+    logger.error(f"❌ Source {source_config['name']} failed: {error}")
+    return {
+        'source': source_config['name'],
+        'status': 'failed',
+        'rows': 0,
+        'valid': 0,
+        'rejected': 0,
+        'seconds': 0.0,
+        'error': str(error)
+    }
+
+
+# Extract → Transform → Validate → Load for one source; returns a summary dict
+def run_source(source_config, defaults):
+    started = time.perf_counter()
+    
+    # File sources have a path, API sources a url
+    file_path = source_config.get('path', source_config.get('url'))
+    primary_key = source_config.get('primary_key', 'location_id')
+    db_url = defaults['db_url']
+    
+    metrics.set_labels(source=source_config['name'])
+    
+    logger.info("\n" + "="*70)
+    logger.info(f"SOURCE: {source_config['name']}")
+    logger.info("="*70)
+    logger.info(f" Source: {file_path}")
+    logger.info(f" Database: {source_config['target_table']}")
+    
+    # Unchanged files are skipped, append-only files resume at the last loaded byte
+    plan = plan_source(source_config, defaults)
+    if plan is not None and plan.action == SKIP:
+        return skip_source(source_config, defaults, plan, started)
+    offset = plan.offset if plan is not None else 0
+    # Read only up to the end of the last complete line the manifest will record; the rest is next run's
+    end = plan.fingerprint['offset'] if plan is not None else None
+    
+    # Inserted / updated / unchanged counts from the staging upserts
+    load_stats = {}
+    
+    # Streaming mode: memory is bounded by chunk_size instead of file size
+    chunk_size = source_config.get('chunk_size', defaults.get('chunk_size'))
+    if chunk_size:
+        total_rows, valid_count, rejected_count = run_streaming(
+            source_config, defaults, chunk_size, primary_key, load_stats, offset, end
+        )
+        record_source(source_config, defaults, plan, total_rows)
+        log_summary(total_rows, valid_count, rejected_count)
+        return source_result(source_config, total_rows, valid_count, rejected_count, started, load_stats)
+    
+    # Extract
+    logger.info("\n[2/5] Extracting Data...")
+    with stage('extract') as record:
+        df = extract(source_config, offset=offset, end=end)
+        record['rows'] = len(df)
+    logger.info(f" Extracted {len(df)} rows")
+    
+    # Tranform - Clean Data
+    logger.info("\n[3/5] Transform Data...")
+    df = timed('clean', compile_clean_plan(source_config, defaults).apply, df)
+    df = compact(df, defaults, primary_key)
+    logger.info(f" Cleaned {len(df)} rows")
+    
+    # Transfor - Valid Data
+    logger.info("\n[4/5] Validating Data...")
+    vaild_df, rejected_df = timed('validate', apply_all_validations, df, primary_key=primary_key,
+                                  plan=validation_plan(source_config))
+    logger.info(f" Validating Complete: {len(vaild_df)} valid, {len(rejected_df)} rejected")
+    
+    # Load to Database
+    logger.info("\n[5/5] Loading to database...")
+    with pooled_connection(db_url, **pool_options(defaults)) as conn:
+        
+        with stage('load.create_tables'):
+            create_tables(conn)
+        
+        if offset:
+            vaild_df = drop_loaded_keys(conn, vaild_df, source_config, primary_key)
+        with stage('load.staging', rows=len(vaild_df)):
+            valid_count = load_valid(conn, vaild_df, source_config, defaults, primary_key, load_stats)
+        
+        with stage('load.rejected', rows=len(rejected_df)):
+            rejected_count = load_rejected(
+                conn,
+                rejected_df,
+                source_name=source_config['name'],
+                **rejected_options(defaults)
+            )
+        
+        logger.info(f" Loaded {valid_count} valid records")
+        logger.info(f" Loaded {rejected_count} rejected records")
+    
+    record_source(source_config, defaults, plan, len(df))
+    log_summary(len(df), valid_count, rejected_count)
+    
+    return source_result(source_config, len(df), valid_count, rejected_count, started, load_stats)
+
+
+def source_result(source_config, total_rows, valid_count, rejected_count, started, load_stats=None, status='ok'):
+    return {
+        'source': source_config['name'],
+        'status': status,
+        'rows': total_rows,
+        'valid': valid_count,
+        'rejected': rejected_count,
+        **(load_stats or {}),
+        'seconds': round(time.perf_counter() - started, 3),
+        'error': None
+    }
+
+
+# Manifest decision for a file source; None when defaults.manifest_path is not set,
+    # the source sets "incremental": false, or it is an API (always read in full)
+def plan_source(source_config, defaults):
+    manifest_path = defaults.get('manifest_path')
+    source_type = source_config.get('type', 'csv')
+    if not manifest_path or source_type == 'api' or not source_config.get('incremental', True):
+        return None
+    
+    path = source_config['path']
+    # New lines can be appended to CSV and NDJSON files, not to one big JSON array
+    appendable = source_type == 'csv' or not is_json_array(path)
+    target = ingestion_target(defaults['db_url'], source_config['target_table'])
+    with stage('manifest.plan'):
+        plan = plan_ingestion(manifest_path, source_config['name'], path, appendable, target)
+    # "tail": false still reads whole lines only, but a grown file is loaded from the start
+    if plan.action == TAIL and not source_config.get('tail', True):
+        plan = IngestionPlan(FULL, 0, plan.fingerprint, plan.entry)
+    
+    if plan.offset:
+        logger.info(f" Resuming at byte {plan.offset}: only rows appended since run {plan.entry['run_id']}")
+    elif plan.action != SKIP and plan.entry and plan.entry.get('target') != target:
+        logger.info(f" Last loaded into {plan.entry.get('target')} (run {plan.entry['run_id']}): reloading the whole file")
+    elif plan.action != SKIP and plan.entry:
+        logger.info(f" Changed since run {plan.entry['run_id']}: reloading the whole file")
+    return plan
+
+
+def skip_source(source_config, defaults, plan, started):
+    logger.info(f" ⏭️  Unchanged since run {plan.entry['run_id']}: skipping")
+    # Touched but identical: remember the new mtime so the next check is a plain stat()
+    if plan.fingerprint is not plan.entry:
+        record_source(source_config, defaults, plan, 0)
+    return source_result(source_config, 0, 0, 0, started, status='skipped')
+
+
+# Recorded only after everything was loaded: a crash before this point repeats the work next run
+    # (staging upserts are no-ops for unchanged rows; rejects already in stg_rejects are inserted again)
+def record_source(source_config, defaults, plan, total_rows):
+    if plan is None:
+        return
+    report = metrics.active_report()
+    record_ingestion(defaults['manifest_path'], source_config['name'], plan.fingerprint,
+                     report.run_id if report else None, total_rows)
+
+
+# Runs read → clean → validate → load one chunk at a time over one pooled connection
+    # The three stages overlap: chunk N is loaded while chunk N+1 is cleaned and N+2 parsed
+def run_streaming(source_config, defaults, chunk_size, primary_key, load_stats=None, offset=0, end=None):
+    logger.info(f"\n[2/5] Streaming data in chunks of {chunk_size} rows...")
+    total_rows = 0
+    valid_count = 0
+    rejected_count = 0
+    # Primary keys already loaded, so duplicates across chunks keep the first occurrence
+        # Memory grows with the number of distinct keys in the source (not bounded by chunk_size)
+    seen_keys = set()
+    clean_plan = compile_clean_plan(source_config, defaults)
+    rules = validation_plan(source_config)
+    
+    def transform(chunk):
+        nonlocal total_rows
+        total_rows += len(chunk)
+        
+        # Transform - Clean Data
+        chunk = timed('clean', clean_plan.apply, chunk)
+        chunk = compact(chunk, defaults, primary_key)
+        
+        # Transform - Validate Data
+        valid_df, rejected_df = timed('validate', apply_all_validations, chunk, primary_key=primary_key, plan=rules)
+        if primary_key in valid_df.columns:
+            # One set lookup per row; isin(seen_keys) would rebuild a hashtable of every key seen so far per chunk
+            already_loaded = valid_df[primary_key].map(seen_keys.__contains__).to_numpy(dtype=bool)
+            valid_df = valid_df[~already_loaded]
+            seen_keys.update(valid_df[primary_key])
+        return valid_df, rejected_df
+    
+    with pooled_connection(defaults['db_url'], **pool_options(defaults)) as conn:
+        with stage('load.create_tables'):
+            create_tables(conn)
+        
+        def load(frames):
+            nonlocal valid_count, rejected_count
+            valid_df, rejected_df = frames
+            if offset:
+                valid_df = drop_loaded_keys(conn, valid_df, source_config, primary_key)
+            
+            # Load to Database
+            with stage('load.staging', rows=len(valid_df)):
+                valid_count += load_valid(conn, valid_df, source_config, defaults, primary_key, load_stats)
+            with stage('load.rejected', rows=len(rejected_df)):
+                rejected_count += load_rejected(
+                    conn,
+                    rejected_df,
+                    source_name=source_config['name'],
+                    **rejected_options(defaults)
+                )
+            logger.info(f" Chunk loaded: {valid_count} valid, {rejected_count} rejected so far")
+        
+        utilisation = run_pipelined(
+            timed_chunks('extract', extract(source_config, chunk_size, offset, end)),
+            [('transform', transform), ('load', load)],
+            queue_size=defaults.get('pipeline', {}).get('queue_size', 2)
+        )
+    
+    # Per-stage utilisation goes into the run report next to the stage timings
+    metrics.merge_stages([{**record, 'stage': f"pipeline.{record['stage']}", 'source': source_config['name']}
+                          for record in utilisation])
+    return total_rows, valid_count, rejected_count
+
+
+# Tail mode: keys loaded from the earlier part of the file keep their first row, as in a full load
+    # (drop_duplicates keeps the first occurrence; upserting the appended row would keep the last)
+    # Any key in target_table counts, so tailing is off for tables shared by several sources (disable_shared_tails)
+def drop_loaded_keys(conn, df, source_config, primary_key):
+    if primary_key not in df.columns or len(df) == 0:
+        return df
+    with stage('load.existing_keys', rows=len(df)):
+        loaded = existing_keys(conn, df, source_config['target_table'], primary_key)
+    if not loaded:
+        return df
+    logger.info(f"✅ Skipped {len(loaded)} appended rows whose {primary_key} is already loaded (kept first occurrence)")
+    return df[~df[primary_key].isin(loaded)]
+
+
+# Loads valid rows over conn, or in parallel shards over several pooled connections when load_workers > 1
+def load_valid(conn, df, source_config, defaults, primary_key, load_stats=None):
+    load_workers = defaults.get('load_workers', 1)
+    if load_workers > 1:
+        return load_partitioned(
+            defaults['db_url'],
+            df,
+            table_name=source_config['target_table'],
+            pk_column=primary_key,
+            workers=load_workers,
+            pool=pool_options(defaults),
+            stats=load_stats,
+            **staging_options(defaults)
+        )
+    return load_to_staging(
+        conn,
+        df,
+        table_name=source_config['target_table'],
+        pk_column=primary_key,
+        stats=load_stats,
+        **staging_options(defaults)
+    )
+
+
+# Loader settings from defaults: load_method picks row / values / copy, page_size is rows per VALUES statement
+def staging_options(defaults):
+    return {
+        'batch_size': defaults['batch_size'],
+        'method': defaults.get('load_method', 'row'),
+        'page_size': defaults.get('page_size')
+    }
+
+
+def rejected_options(defaults):
+    # Rejects go in with the same method as valid rows (COPY, multi-row INSERTs or one INSERT per row)
+    return {'method': defaults.get('load_method', 'row'), 'page_size': defaults.get('page_size') or defaults['batch_size']}
+
+
+# Connection pool size per process, from defaults.pool
+def pool_options(defaults):
+    pool = defaults.get('pool', {})
+    return {
+        'min_size': pool.get('min_size', 1),
+        'max_size': pool.get('max_size', 10),
+        'timeout': pool.get('timeout', 30)
+    }
+
+
+# Categoricals / smallest nullable ints after cleaning (defaults.compact), bytes saved go in the stage record
+def compact(df, defaults, primary_key):
+    options = defaults.get('compact', {})
+    if not options.get('enabled', True):
+        return df
+    with stage('compact', rows=len(df)) as record:
+        df, report = compact_frame(df, options.get('max_category_ratio', 0.5), keep=(primary_key,))
+        record['bytes_before'] = report['bytes_before']
+        record['bytes_after'] = report['bytes_after']
+    return df
+
+
+# Log level, terminal verbosity and log file format, from defaults.logging
+def logging_options(defaults):
+    options = defaults.get('logging', {})
+    return {
+        'level': options.get('level', 'INFO'),
+        'console_level': options.get('console_level'),
+        'log_format': options.get('format', 'text')
+    }
+
+
+# Picks the reader for the source "type" (csv by default)
+def extract(source_config, chunk_size=None, offset=0, end=None):
+    source_type = source_config.get('type', 'csv')
+    options = reader_options(source_config)
+    if chunk_size:
+        options['chunksize'] = chunk_size
+    # Byte offset of the first new line in an append-only file
+    if offset:
+        options['offset'] = offset
+    # Byte offset just past the last complete line (file sources with a manifest plan)
+    if end is not None:
+        options['end'] = end
+    
+    if source_type == 'csv':
+        return read_csv(source_config['path'], **options)
+    if source_type == 'json':
+        return read_json(source_config['path'], **options)
+    if source_type == 'api':
+        return read_api(source_config['url'], **options)
+    raise ValueError(f"Unknown source type: {source_type}")
+
+
+# Reader settings a source may declare in sources.json
+def reader_options(source_config):
+    option_keys = {
+        'csv': ('schema', 'engine'),
+        'json': ('schema',),
+        'api': ('schema', 'page_size', 'fetch_workers', 'records_key', 'page_param',
+                'page_size_param', 'params', 'retries', 'backoff', 'timeout')
+    }
+    keys = option_keys.get(source_config.get('type', 'csv'), ())
+    return {key: source_config[key] for key in keys if key in source_config}
+
+
+def log_source_results(results):
+    logger.info("\n" + "="*70)
+    logger.info("SOURCE SUMMARY")
+    logger.info("="*70)
+    for result in results:
+        if result['status'] == 'skipped':
+            logger.info(f"⏭️  {result['source']}: unchanged since the last run, skipped")
+        elif result['status'] == 'ok':
+            logger.info(f"✅ {result['source']}: {result['rows']} rows, {result['valid']} valid, "
+                        f"{result['rejected']} rejected in {result['seconds']:.1f}s")
+            if 'unchanged' in result:
+                logger.info(f"   {result['inserted']} inserted, {result['updated']} updated, "
+                            f"{result['unchanged']} unchanged")
+        else:
+            logger.info(f"❌ {result['source']}: FAILED - {result['error']}")
+
+
+def log_summary(total_rows, valid_count, rejected_count):
+    logger.info("\n" + "="*70)
+    logger.info("ETL PIPELINE COMPLETE ✅")
+    logger.info("="*70)
+    logger.info(f"Total records processed: {total_rows}")
+    logger.info(f"Valid records loaded: {valid_count}")
+    logger.info(f"Rejected records logged: {rejected_count}")
+    if total_rows > 0:
+        logger.info(f"Success rate: {(valid_count/total_rows*100):.1f}%")
+
 
 if __name__=="__main__": # pragma: no cover
     run_pipeline()
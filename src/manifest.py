@@ -0,0 +1,198 @@
+# manifest.py - Remembers what has already been ingested from each file source
+'''
+The manifest is one JSON file (defaults.manifest_path) with an entry per source:
+
+    {"real_estate_csv": {"path": "data/real_estate.csv", "size": 1843211, "mtime_ns": ...,
+                         "offset": 1843211, "content_hash": "sha256...",
+                         "target": "postgresql://localhost:5432/real_estate_db#stg_real_estate",
+                         "run_id": "...", "rows": 9130}}
+
+offset is how many bytes (complete lines only) were loaded, content_hash is the sha256
+of exactly those bytes. On the next run a source is:
+
+    skipped   same size + mtime, or same content after a touch
+    tailed    the first `offset` bytes still hash to content_hash → only the appended
+              bytes after offset are parsed and loaded (CSV and NDJSON); keys already in
+              the target table keep their row, like the first occurrence in a full load
+    reloaded  anything else (rewritten file, new path, JSON arrays that changed), or
+              when the rows now go to another database / table (target, without credentials)
+
+The manifest cannot see the tables themselves: after the tables are dropped in the same
+database, clear the entries with reset_ingestion (scripts/cleanup_database.py does) or
+delete the manifest file, otherwise unchanged files keep being skipped.
+
+An entry is written only after the source has been fully loaded, through a temp file +
+os.replace under a lock, so a crash leaves the previous entry in place and the next run
+repeats the work. For the staging table that is harmless (the row_hash upsert makes
+repeated rows no-ops), but stg_rejects is append-only: rejects from the interrupted
+run are inserted again and show up twice (same source_name and raw_data).
+'''
+
+import fcntl
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils import logger
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+SKIP = 'skip'
+TAIL = 'tail'
+FULL = 'full'
+
+
+class IngestionPlan:
+    def __init__(self, action, offset, fingerprint, entry=None):
+        self.action = action
+        # Byte offset to start reading from (0 unless tailing)
+        self.offset = offset
+        # What the file looks like now; recorded once the load succeeds
+        self.fingerprint = fingerprint
+        self.entry = entry
+
+
+# Function 01: Decide whether a file source can be skipped, tailed or must be reloaded
+    # target: where the rows are loaded (ingestion_target); a different target means a full load
+def plan_ingestion(manifest_path, source_name, path, appendable=True, target=None):
+    entry = load_manifest(manifest_path).get(source_name)
+    stat = os.stat(path)
+    # Entries for another file or another database / table say nothing about this load
+    same_source = entry is not None and entry['path'] == path and entry.get('target') == target
+
+    if same_source and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return IngestionPlan(SKIP, 0, entry, entry)
+
+    # Only whole lines count as processed; a half-written last line is picked up next time
+    end = complete_lines_end(path, stat.st_size) if appendable else stat.st_size
+    previous_offset = entry['offset'] if same_source else None
+    prefix_hash, content_hash = hash_file(path, end, previous_offset)
+
+    fingerprint = {
+        'path': path,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'offset': end,
+        'content_hash': content_hash,
+        'target': target
+    }
+
+    if previous_offset is None:
+        return IngestionPlan(FULL, 0, fingerprint, entry)
+    if content_hash == entry['content_hash'] and end == previous_offset:
+        return IngestionPlan(SKIP, 0, fingerprint, entry)
+    if appendable and 0 < previous_offset < end and prefix_hash == entry['content_hash']:
+        return IngestionPlan(TAIL, previous_offset, fingerprint, entry)
+    return IngestionPlan(FULL, 0, fingerprint, entry)
+
+
+# Function 02: Store the fingerprint of a successfully loaded source
+def record_ingestion(manifest_path, source_name, fingerprint, run_id, rows):
+    with _locked(manifest_path):
+        manifest = load_manifest(manifest_path)
+        manifest[source_name] = {
+            **fingerprint,
+            'run_id': run_id,
+            'rows': rows,
+            'ingested_at': datetime.now().isoformat(timespec='seconds')
+        }
+        _write_atomic(manifest_path, manifest)
+    logger.info(f" Manifest: {source_name} recorded up to byte {fingerprint['offset']}")
+
+
+# Function 03: Forget sources (all of them when source_names is None) so their next run is a full load
+def reset_ingestion(manifest_path, source_names=None):
+    with _locked(manifest_path):
+        manifest = load_manifest(manifest_path)
+        removed = [name for name in manifest if source_names is None or name in source_names]
+        for name in removed:
+            del manifest[name]
+        if removed:
+            _write_atomic(manifest_path, manifest)
+    logger.info(f" Manifest: reset {len(removed)} sources")
+    return removed
+
+
+# Database URL + table without user / password, so the manifest never stores credentials
+def ingestion_target(db_url, target_table):
+    parts = urlsplit(db_url)
+    host = parts.hostname or ''
+    netloc = f"{host}:{parts.port}" if parts.port else host
+    return urlunsplit((parts.scheme, netloc, parts.path, '', target_table))
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as the_file:
+        return json.load(the_file)
+
+
+# Helper: Byte position just after the last newline in the first `size` bytes
+def complete_lines_end(path, size):
+    with open(path, 'rb') as the_file:
+        position = size
+        while position > 0:
+            start = max(0, position - HASH_BLOCK_SIZE)
+            the_file.seek(start)
+            block = the_file.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+# Helper: sha256 of the first `end` bytes, plus the hash of the first `split_at` bytes from the same pass
+def hash_file(path, end, split_at=None):
+    digest = hashlib.sha256()
+    prefix_hash = None
+    position = 0
+
+    with open(path, 'rb') as the_file:
+        while position < end:
+            limit = end if split_at is None or position >= split_at else min(end, split_at)
+            block = the_file.read(min(HASH_BLOCK_SIZE, limit - position))
+            if not block:
+                break
+            digest.update(block)
+            position += len(block)
+            if position == split_at:
+                prefix_hash = digest.hexdigest()
+
+    if split_at == 0:
+        prefix_hash = hashlib.sha256().hexdigest()
+    return prefix_hash, digest.hexdigest()
+
+
+def _write_atomic(manifest_path, manifest):
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{manifest_path}.tmp.{os.getpid()}"
+    with open(temp_path, 'w') as the_file:
+        json.dump(manifest, the_file, indent=2)
+        the_file.flush()
+        os.fsync(the_file.fileno())
+    os.replace(temp_path, manifest_path)
+
+
+# Sources in different worker processes update the same manifest; one writer at a time
+@contextmanager
+def _locked(manifest_path):
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(f"{manifest_path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+'''manifest.py fingerprints file sources (size, mtime, sha256 of the
+loaded bytes, offset, target table) so unchanged files are skipped and
+append-only files only have their new tail loaded.'''
@@ -0,0 +1,176 @@
+# metrics.py - Stage timing, CPU and memory instrumentation for the pipeline
+'''
+Every pipeline stage (config, extract, clean (per column when clean_columns is on),
+each validation step and rule column, each load batch) runs inside
+`with stage("name", rows=...)`. A stage records:
+
+    wall_seconds      elapsed time
+    cpu_seconds       process CPU time used (all threads)
+    peak_rss_mb       process peak resident memory so far
+    tracemalloc_mb    peak Python allocations during the stage (only when trace_memory is on)
+    rows_per_sec      rows / wall_seconds
+
+Records are collected into the active RunReport and written as JSON next to
+logs/pipeline.log, so a slow run can be broken down stage by stage.
+'''
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils import logger, logs_dir
+
+_active_report = None
+# Added to every stage record (e.g. the source being processed)
+_labels = {}
+
+
+class RunReport:
+    def __init__(self, run_id=None, trace_memory=False):
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.stages = []
+        self.extra = {}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'trace_memory': self.trace_memory,
+            **self.extra,
+            'stages': self.stages
+        }
+
+    def write(self, directory=None):
+        directory = directory or logs_dir
+        path = os.path.join(directory, f"run_report_{self.run_id}.json")
+        with open(path, 'w') as the_file:
+            json.dump(self.to_dict(), the_file, indent=2, default=str)
+        return path
+
+
+# Starts collecting stage records for this process
+def start_run(trace_memory=False, run_id=None):
+    global _active_report
+    _active_report = RunReport(run_id=run_id, trace_memory=trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _active_report
+
+
+# Stops collecting and returns the finished report (None if no run was started)
+def finish_run():
+    global _active_report
+    report, _active_report = _active_report, None
+    if report is not None and report.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return report
+
+
+def active_report():
+    return _active_report
+
+
+# Turns on tracemalloc for the active report (it slows Python allocations down, so it is opt-in)
+def enable_trace_memory():
+    if _active_report is not None:
+        _active_report.trace_memory = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def set_labels(**labels):
+    _labels.clear()
+    _labels.update(labels)
+
+
+# Adds stage records collected elsewhere (e.g. in a worker process) to the active report
+def merge_stages(records):
+    if _active_report is not None:
+        for record in records:
+            _active_report.add(record)
+
+
+@contextmanager
+def stage(name, rows=None, **fields):
+    # The caller may fill in record['rows'] (or other fields) inside the block
+    record = {'stage': name, **_labels, 'rows': rows, **fields}
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Nested stages reset the peak, so an outer stage only sees the peak after its last inner stage
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        yield record
+    finally:
+        wall_seconds = time.perf_counter() - wall_started
+        record['wall_seconds'] = round(wall_seconds, 6)
+        record['cpu_seconds'] = round(time.process_time() - cpu_started, 6)
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        record['peak_rss_mb'] = round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1]
+            record['tracemalloc_mb'] = round((peak - memory_before) / (1024 * 1024), 3)
+        if record['rows'] is not None and wall_seconds > 0:
+            record['rows_per_sec'] = round(record['rows'] / wall_seconds, 1)
+
+        if _active_report is not None:
+            _active_report.add(record)
+
+
+# Runs func(df, ...) as a stage named after it, counting the rows going in
+def timed(name, func, df, *args, **kwargs):
+    with stage(name, rows=len(df)):
+        return func(df, *args, **kwargs)
+
+
+# Wraps a chunk iterator so the time spent producing each chunk is its own stage
+def timed_chunks(name, chunks):
+    iterator = iter(chunks)
+    while True:
+        with stage(name) as record:
+            chunk = next(iterator, None)
+            record['rows'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def log_report(report):
+    totals = {}
+    for record in report.stages:
+        # Records without a wall time (e.g. pipeline utilisation) are not timings
+        if 'wall_seconds' not in record:
+            continue
+        name = record['stage']
+        totals[name] = totals.get(name, 0.0) + record['wall_seconds']
+
+    logger.info("\n" + "="*70)
+    logger.info("STAGE TIMINGS")
+    logger.info("="*70)
+    for name, seconds in sorted(totals.items(), key=lambda item: -item[1]):
+        logger.info(f" {name:<40} {seconds:>10.3f}s")
+
+
+'''metrics.py measures wall time, CPU, memory and throughput for every
+pipeline stage and writes them to a JSON run report in logs/.'''
@@ -2,18 +2,44 @@
 # You'll build this step by step!
 #  python3 src/readers/csv_read.py
 
+import io
 import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
 import sys 
 import os
+from contextlib import contextmanager
 
 # Add parent directory to path to import from src/
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import logger
+from dates import parse_dates, log_coerced, MISSING_DATES
 
 
-def read_csv(file_path): #LOAD CSV
+def read_csv(file_path, chunksize=None, schema=None, engine=None, offset=0, end=None): #LOAD CSV
+    # Column schema from sources.json → dtype / usecols / date formats for pandas
+    read_options, date_formats = read_options_from_schema(schema, engine)
+    
+    # Streaming mode: hand back an iterator of DataFrames instead of one big frame
+    if chunksize:
+        # Arrow fixes column types from the first block, so it streams only when the schema types every column
+        if engine == 'pyarrow' and read_options.get('usecols'):
+            return _read_arrow_chunks(file_path, chunksize, read_options, date_formats, offset, end)
+        if engine == 'pyarrow':
+            logger.warning(f"⚠️ {file_path}: engine 'pyarrow' needs a schema to read in chunks; using the pandas C parser")
+        return _read_csv_chunks(file_path, chunksize, read_options, date_formats, offset, end)
+
     # read CSV file into a pandas DataFrame.
-    df = pd.read_csv(file_path)
+    # engine='pyarrow' parses on all cores and keeps columns Arrow-backed (string[pyarrow], int64[pyarrow])
+    if engine == 'pyarrow' and read_options.get('usecols'):
+        # Same explicit column types as the chunked reader: a "string" zip keeps its leading zero
+        df = _read_arrow(file_path, read_options, date_formats, offset, end)
+    else:
+        if engine == 'pyarrow':
+            read_options['engine'] = 'pyarrow'
+            read_options['dtype_backend'] = 'pyarrow'
+        with open_csv_source(file_path, offset, end) as source:
+            df = pd.read_csv(source, **read_options)
+        df = parse_date_columns(df, date_formats)
     
     logger.info("\n" + "="*50)
     logger.info(f"Loaded ======> {len(df)} rows from {file_path}") #COUNT ROWS
@@ -26,6 +52,208 @@ def read_csv(file_path): #LOAD CSV
     logger.info("="*50)
     return df
 
+
+def _read_csv_chunks(file_path, chunksize, read_options, date_formats, offset=0, end=None):
+    # Only one chunk of `chunksize` rows is held in memory at a time
+    total_rows = 0
+    with open_csv_source(file_path, offset, end) as source:
+        with pd.read_csv(source, chunksize=chunksize, **read_options) as reader:
+            for chunk_number, chunk in enumerate(reader, start=1):
+                total_rows += len(chunk)
+                logger.info(f"Chunk {chunk_number} ======> {len(chunk)} rows from {file_path} ({total_rows} so far)")
+                yield parse_date_columns(chunk, date_formats)
+
+
+# Reading from a byte offset (new rows appended since the last run): the header line + the bytes in [offset, end)
+    # end: where the complete lines stop (manifest offset); a half-written last line is left for the next run
+@contextmanager
+def open_csv_source(file_path, offset=0, end=None):
+    if not offset and (end is None or end >= os.path.getsize(file_path)):
+        yield file_path
+        return
+    
+    with open_byte_range(file_path, offset, end) as body:
+        if not offset:
+            yield body
+            return
+        with open(file_path, 'rb') as head:
+            header = head.readline()
+        yield io.BufferedReader(_ConcatStream([io.BytesIO(header), body]))
+
+
+# Binary file object over bytes [offset, end) of file_path (end=None reads to EOF)
+def open_byte_range(file_path, offset=0, end=None):
+    raw_file = open(file_path, 'rb')
+    raw_file.seek(offset)
+    if end is None:
+        return raw_file
+    return io.BufferedReader(_BoundedStream(raw_file, end - offset))
+
+
+class _BoundedStream(io.RawIOBase):
+    def __init__(self, raw_file, remaining):
+        self._raw_file = raw_file
+        self._remaining = max(0, remaining)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self._remaining == 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        count = self._raw_file.readinto(view) or 0
+        self._remaining -= count
+        return count
+    
+    def close(self):
+        self._raw_file.close()
+        super().close()
+
+
+class _ConcatStream(io.RawIOBase):
+    def __init__(self, parts):
+        self._parts = list(parts)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while self._parts:
+            count = self._parts[0].readinto(buffer)
+            if count:
+                return count
+            self._parts.pop(0)
+        return 0
+
+
+# Whole file with the pyarrow CSV reader and the schema's column types
+def _read_arrow(file_path, read_options, date_formats, offset=0, end=None):
+    import pyarrow.csv as pa_csv
+    
+    with open_csv_source(file_path, offset, end) as source:
+        table = pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=arrow_convert_options(read_options)
+        )
+    df = table.to_pandas(types_mapper=pd.ArrowDtype).astype(read_options.get('dtype', {}))
+    return parse_date_columns(df, date_formats)
+
+
+# The pyarrow CSV reader has no chunksize, so stream its record batches and re-slice them into chunks
+def _read_arrow_chunks(file_path, chunksize, read_options, date_formats, offset=0, end=None):
+    import pyarrow.csv as pa_csv
+    
+    with open_csv_source(file_path, offset, end) as source:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=arrow_convert_options(read_options)
+        )
+        yield from _rechunk_arrow(reader, file_path, chunksize, read_options.get('dtype', {}), date_formats)
+
+
+# Arrow ConvertOptions for the schema's columns
+    # Every loaded column gets an explicit Arrow type, so a later block (e.g. zip "06103-1125" after
+    # thousands of numeric zips) can't conflict with what was inferred from the first one
+    # Empty (also quoted) fields and pandas' default NA strings are nulls, as with the C engine,
+    # so not_null rules see the same values whichever engine read the file
+def arrow_convert_options(read_options):
+    import pyarrow.csv as pa_csv
+    
+    dtype = read_options.get('dtype', {})
+    return pa_csv.ConvertOptions(
+        include_columns=read_options['usecols'],
+        column_types={col: arrow_type(dtype.get(col)) for col in read_options['usecols']},
+        null_values=sorted(STR_NA_VALUES),
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True
+    )
+
+
+# Arrow type for a schema dtype; columns without a numeric/bool dtype are read as text
+def arrow_type(dtype):
+    import pyarrow as pa
+    
+    arrow_types = {
+        'Int8': pa.int8(), 'Int16': pa.int16(), 'Int32': pa.int32(), 'Int64': pa.int64(),
+        'int8': pa.int8(), 'int16': pa.int16(), 'int32': pa.int32(), 'int64': pa.int64(),
+        'Float32': pa.float32(), 'Float64': pa.float64(), 'float32': pa.float32(), 'float64': pa.float64(),
+        'boolean': pa.bool_(), 'bool': pa.bool_()
+    }
+    return arrow_types.get(str(dtype), pa.string())
+
+
+def _rechunk_arrow(reader, file_path, chunksize, dtype, date_formats):
+    import pyarrow as pa
+    
+    def to_frame(table, start_row):
+        chunk = table.to_pandas(types_mapper=pd.ArrowDtype)
+        chunk.index = pd.RangeIndex(start_row, start_row + len(chunk))
+        return parse_date_columns(chunk.astype(dtype), date_formats)
+    
+    total_rows = 0
+    chunk_number = 0
+    pending = None
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        pending = table if pending is None else pa.concat_tables([pending, table])
+        
+        while pending.num_rows >= chunksize:
+            chunk_number += 1
+            chunk = to_frame(pending.slice(0, chunksize), total_rows)
+            pending = pending.slice(chunksize)
+            total_rows += len(chunk)
+            logger.info(f"Chunk {chunk_number} ======> {len(chunk)} rows from {file_path} ({total_rows} so far)")
+            yield chunk
+    
+    if pending is not None and pending.num_rows > 0:
+        chunk = to_frame(pending, total_rows)
+        total_rows += len(chunk)
+        logger.info(f"Chunk {chunk_number + 1} ======> {len(chunk)} rows from {file_path} ({total_rows} so far)")
+        yield chunk
+
+
+# Turns a source "schema" block into pandas read_csv options
+    # "column name": {"dtype": "category" | "string" | "Int32" | "date" | ..., "format": "%Y.%m.%d", "load": false}
+def read_options_from_schema(schema, engine=None):
+    if not schema:
+        return {}, {}
+    
+    # With the pyarrow engine plain "string" columns stay Arrow-backed
+    string_dtype = 'string[pyarrow]' if engine == 'pyarrow' else 'string'
+    
+    dtype = {}
+    date_formats = {}
+    usecols = []
+    
+    for column, spec in schema.items():
+        if not spec.get('load', True):
+            continue
+        usecols.append(column)
+        
+        if spec.get('dtype') == 'date':
+            # Dates are read as text and parsed with their explicit format afterwards
+            dtype[column] = string_dtype
+            date_formats[column] = spec.get('format')
+        elif spec.get('dtype') == 'string':
+            dtype[column] = string_dtype
+        elif 'dtype' in spec:
+            dtype[column] = spec['dtype']
+    
+    return {'dtype': dtype, 'usecols': usecols}, date_formats
+
+
+# Parses date columns with the schema's explicit format; bad values become NaT
+    # The "0" placeholder becomes NaT too, but only real parse failures are logged
+def parse_date_columns(df, date_formats):
+    for column, date_format in date_formats.items():
+        if column in df.columns:
+            df[column], coerced = parse_dates(df[column], date_format, missing=MISSING_DATES)
+            log_coerced(column, coerced)
+    return df
+
 if __name__=="__main__": # pragnma: no cover
     # Test the function
     df = read_csv("data/real_estate.csv")
@@ -0,0 +1,181 @@
+# json_reader.py - Functions to read JSON exports of the real estate feed
+#  python3 src/readers/json_reader.py data/real_estate.json
+#
+# Handles both formats our upstreams publish:
+#   - newline-delimited JSON (one record per line)
+#   - one big top-level array: [ {...}, {...}, ... ]
+# Records are parsed one at a time, so only one chunk is ever held in memory.
+
+import io
+import json
+import re
+import pandas as pd
+import sys
+import os
+
+# Add parent directory to path to import from src/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils import logger
+from readers.csv_read import read_options_from_schema, parse_date_columns, open_byte_range
+
+READ_BLOCK_SIZE = 1024 * 1024
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+def read_json(file_path, chunksize=None, schema=None, offset=0, end=None): #LOAD JSON
+    # Streaming mode: hand back an iterator of DataFrames, same as read_csv
+    if chunksize:
+        return _read_json_chunks(file_path, chunksize, schema, offset, end)
+
+    chunks = list(_read_json_chunks(file_path, 100000, schema, offset, end))
+    df = pd.concat(chunks) if chunks else pd.DataFrame()
+
+    logger.info("\n" + "="*50)
+    logger.info(f"Loaded ======> {len(df)} rows from {file_path}") #COUNT ROWS
+    logger.info("="*50)
+    logger.info(f"Columns =======> {list(df.columns)}") #GET COLUMNS NAMES
+    return df
+
+
+def _read_json_chunks(file_path, chunksize, schema, offset=0, end=None):
+    total_rows = 0
+    chunk_number = 0
+    records = []
+
+    for record in iter_json_records(file_path, offset, end):
+        records.append(record)
+        if len(records) == chunksize:
+            chunk_number += 1
+            chunk = records_to_frame(records, total_rows, schema)
+            total_rows += len(chunk)
+            records = []
+            logger.info(f"Chunk {chunk_number} ======> {len(chunk)} rows from {file_path} ({total_rows} so far)")
+            yield chunk
+
+    if records:
+        chunk = records_to_frame(records, total_rows, schema)
+        total_rows += len(chunk)
+        logger.info(f"Chunk {chunk_number + 1} ======> {len(chunk)} rows from {file_path} ({total_rows} so far)")
+        yield chunk
+
+
+# Flattens nested records into the dotted column names the CSV feed uses (location.address.city, ...)
+def records_to_frame(records, start_row, schema=None):
+    df = flatten_columns(pd.DataFrame(records))
+    df.index = pd.RangeIndex(start_row, start_row + len(df))
+
+    if schema:
+        read_options, date_formats = read_options_from_schema(schema)
+        df = df[[col for col in df.columns if col in read_options['usecols']]]
+        dtype = {col: col_type for col, col_type in read_options['dtype'].items() if col in df.columns}
+        df = parse_date_columns(df.astype(dtype), date_formats)
+    return df
+
+
+# {"location": {"address": {"city": "X"}}} → column "location.address.city"
+    # Expands column by column instead of record by record (same result as pd.json_normalize, much faster)
+def flatten_columns(df, prefix=''):
+    flat = {}
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == "object" and isinstance(_first_value(series), dict):
+            nested = pd.DataFrame([value if isinstance(value, dict) else {} for value in series], index=df.index)
+            flat.update(flatten_columns(nested, f"{prefix}{col}.").items())
+        else:
+            flat[f"{prefix}{col}"] = series
+    return pd.DataFrame(flat, index=df.index)
+
+
+def _first_value(series):
+    # First non-null value, without scanning the whole column
+    return next((value for value in series if value is not None and value == value), None)
+
+
+# Yields one record (dict) at a time from either NDJSON or a top-level JSON array
+    # offset > 0 resumes an NDJSON file at that byte (start of a line), e.g. after new lines were appended
+    # end stops reading there (end of the last complete line), so a half-written line waits for the next run
+def iter_json_records(file_path, offset=0, end=None):
+    array = not offset and is_json_array(file_path)
+    with io.TextIOWrapper(open_byte_range(file_path, offset, end), encoding='utf-8') as the_file:
+        records = _iter_array_records(the_file) if array else _iter_ndjson_records(the_file)
+
+        for record in records:
+            if not isinstance(record, dict):
+                raise ValueError(f"Expected JSON objects in {file_path}, got {type(record).__name__}")
+            yield record
+
+
+# Peeks at the first character: "[" means one big array, anything else NDJSON
+def is_json_array(file_path):
+    with open(file_path, 'r', encoding='utf-8') as the_file:
+        return _first_non_space(the_file) == '['
+
+
+def _first_non_space(the_file):
+    while True:
+        block = the_file.read(4096)
+        if not block:
+            return ''
+        stripped = block.lstrip()
+        if stripped:
+            return stripped[0]
+
+
+def _iter_ndjson_records(the_file):
+    for line in the_file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# Decodes array elements one by one with raw_decode over a sliding buffer
+def _iter_array_records(the_file):
+    decoder = json.JSONDecoder()
+    buffer = the_file.read(READ_BLOCK_SIZE)
+    pos = buffer.index('[') + 1
+    end_of_file = False
+
+    while True:
+        # Skip whitespace and the comma between elements
+        match = SEPARATOR.match(buffer, pos)
+        pos = match.end()
+
+        record, end = None, None
+        if pos < len(buffer):
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                pass
+
+        # An element cut off at the end of the buffer needs more data before it can be decoded
+        if end is None or (end == len(buffer) and not end_of_file):
+            if end_of_file:
+                raise ValueError("Malformed or truncated JSON array")
+            block = the_file.read(READ_BLOCK_SIZE)
+            end_of_file = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+            continue
+
+        yield record
+        pos = end
+
+
+if __name__=="__main__": # pragma: no cover
+    # Test the function
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/real_estate.json"
+    df = read_json(path)
+    print("\n" + "="*50)
+    print("FIRST 3 ROWS:")
+    print("="*50)
+    print(df.head(3))
+    print("\n" + "="*50)
+    print("DATA TYPES:")
+    print("="*50)
+    print(df.dtypes)
+
+
+'''json_reader.py streams JSON / NDJSON exports record by record and
+yields DataFrame chunks with the same dotted column names as the CSV feed.'''
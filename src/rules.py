@@ -6,50 +6,43 @@
   4. Return Multiple Values: Using tuples in Python 
 '''
 
-import pandas as pd
 import sys
 import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import logger
-from validate import validate_required_fields, validate_numeric_ranges, validate_null_values, remove_duplicates
+from metrics import stage
+from validate import validation_plan, split_by_rules, remove_duplicates
 
 
 # MASTER FUNCTION 
-def apply_all_validations(df, primary_key='location_id'):
+    # plan: compiled rules for the source (validate.validation_plan); the built-in rules when None
+def apply_all_validations(df, primary_key='location_id', plan=None):
+    plan = plan if plan is not None else validation_plan()
     
     logger.info("\n" + "="*60)
     logger.info("STARTING VALIDATION PIPELINE")
     logger.info("="*60)
     logger.info(f"Input records: {len(df)}")
     
-    # Track all rejects across all validations steps
-    all_rejects = pd.DataFrame()
-    
-    # Step 01: Validate required fields (columns)
-    logger.info("\n Validation required fields...")
-    valid_df, rejects_required = validate_required_fields(df)
-    if len(rejects_required) > 0:
-        all_rejects = pd.concat([all_rejects, rejects_required], ignore_index=True)
-        
-        
-    # Step 02: Validate numeric ranges (only on valid data so far)
-    logger.info("\n Validation numeric ranges...")
-    valid_df, rejects_numeric = validate_numeric_ranges(valid_df)
-    if len(rejects_numeric) > 0:
-        all_rejects = pd.concat([all_rejects, rejects_numeric], ignore_index=True)
+    # Step 01-03: Evaluate every declared rule once over the input, in precedence order
+    # (built-in: required fields → numeric ranges → NULL values in critical columns)
+    logger.info(f"\n Evaluating {len(plan)} validation rules...")
+    with stage('validate.evaluate', rows=len(df)):
+        rules = plan.evaluate(df)
     
+    with stage('validate.split', rows=len(df)):
+        valid_df, all_rejects = split_by_rules(df, rules)
     
-    # Step 03: Validate NULL values in critical columns
-    logger.info("\n Validating NULL values...")
-    valid_df, rejects_nulls = validate_null_values(valid_df)
-    if len(rejects_nulls) > 0:
-        all_rejects = pd.concat([all_rejects, rejects_nulls], ignore_index=True)
+    # Counted from the reason codes; reject rows are only materialised when they are loaded
+    for reason, count in all_rejects.reason_counts().items():
+        logger.info(f"❌ {reason}: {count}")
     
     
     # Step 04: Remove duplicates (only from valid data)
     logger.info("\n Removing Duplicates...")
-    valid_df = remove_duplicates(valid_df, primary_key)
+    with stage('validate.remove_duplicates', rows=len(valid_df)):
+        valid_df = remove_duplicates(valid_df, primary_key)
     
     
     # Summary
@@ -108,7 +101,8 @@ if __name__=="__main__": # pragma: no cover
         print("\n" + "="*60)
         print("REJECTION BREAKDOWN:")
         print("="*60)
-        print(rejected_df['rejection_reason'].value_counts())
+        for reason, count in rejected_df.reason_counts().items():
+            print(f"{reason}: {count}")
     
     print("\n" + "="*60)
     print("SAMPLE VALID DATA (First 3 rows):")
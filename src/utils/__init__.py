@@ -1,5 +1,9 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 
 # Get the project root directory (three levels up from this file)
@@ -11,25 +15,104 @@ os.makedirs(logs_dir, exist_ok=True)
 
 log_filename = os.path.join(logs_dir, f"pipeline_{datetime.now().strftime('%Y%m%d')}.log")
 
+TEXT_FORMATTER = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+
+# Structured log lines: one JSON object per record, plus any fields passed with extra={...}
+class JsonFormatter(logging.Formatter):
+    STANDARD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'thread': record.threadName,
+            'message': record.getMessage().strip()
+        }
+        for key, value in vars(record).items():
+            if key not in self.STANDARD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
 # Create a named logger
 logger = logging.getLogger("etl_pipeline")
 logger.setLevel(logging.INFO)
 
 # add handlers
-if not logger.handlers:
-    # File handler
-    file_handler = logging.FileHandler(os.path.join(logs_dir, "pipeline.log"), mode="a")
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_formatter = logging.Formatter("%(levelname)s - %(message)s")
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    # Pipeline threads only put records on an in-memory queue; a background QueueListener
+    # thread does the file and terminal I/O, so a slow disk or terminal never stalls a stage.
+for handler in list(logger.handlers):
+    logger.removeHandler(handler)
+
+# File handler
+file_handler = logging.FileHandler(os.path.join(logs_dir, "pipeline.log"), mode="a")
+file_handler.setFormatter(TEXT_FORMATTER)
+
+# Console handler
+console_handler = logging.StreamHandler()
+console_formatter = logging.Formatter("%(levelname)s - %(message)s")
+console_handler.setFormatter(console_formatter)
+
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+logger.addHandler(queue_handler)
+listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+# Whether the listener thread has been started (and not stopped since)
+_listening = False
+
+
+def start_logging():
+    global _listening
+    if not _listening:
+        listener.start()
+        _listening = True
+
+
+# Writes out everything still queued; runs at exit and before the process forks
+def stop_logging():
+    global _listening
+    if _listening:
+        listener.stop()
+        _listening = False
+
+
+def is_logging():
+    return _listening
+
+
+# A forked worker gets a fresh queue (records queued in the parent are the parent's to write)
+    # The parent stopped its listener before the fork, so the child starts its own
+def _restart_in_child():
+    global log_queue, _listening
+    log_queue = queue.SimpleQueue()
+    queue_handler.queue = log_queue
+    listener.queue = log_queue
+    _listening = False
+    start_logging()
+
+
+# Level and verbosity from defaults.logging in sources.json
+    # level: records below it are dropped before they reach the queue
+    # console_level: terminal verbosity (the log file still gets everything from `level` up)
+    # log_format: 'text' or 'json' for logs/pipeline.log
+def configure_logging(level='INFO', console_level=None, log_format='text'):
+    if log_format not in ('text', 'json'):
+        raise ValueError(f"Unknown log format: {log_format}")
+    logger.setLevel(level.upper())
+    console_handler.setLevel((console_level or level).upper())
+    file_handler.setFormatter(JsonFormatter() if log_format == 'json' else TEXT_FORMATTER)
+
+
+start_logging()
+atexit.register(stop_logging)
+os.register_at_fork(before=stop_logging, after_in_parent=start_logging, after_in_child=_restart_in_child)
 
 logger.info("ETL Pipeline Logger initialized")
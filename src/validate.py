@@ -5,44 +5,281 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import re
+import threading
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import logger
+from metrics import stage
+
+# Reason registry
+    # Rejects carry an int8 code per row; this is the only place the code ↔ text mapping lives.
+    # compile_rules registers every reason it sees, and the built-in rules are compiled at import
+    # so their codes are the same in every run.
+REJECTION_REASONS = []
+_reason_codes = {}
+_registry_lock = threading.Lock()
+
+
+def reason_code(reason):
+    code = _reason_codes.get(reason)
+    if code is not None:
+        return code
+    with _registry_lock:
+        if reason not in _reason_codes:
+            if len(REJECTION_REASONS) > np.iinfo(np.int8).max:
+                raise ValueError(f"Too many rejection reasons to encode as int8: {reason}")
+            _reason_codes[reason] = len(REJECTION_REASONS)
+            REJECTION_REASONS.append(reason)
+        return _reason_codes[reason]
+
+
+def reason_text(codes):
+    return np.array(REJECTION_REASONS, dtype=object)[np.asarray(codes, dtype=np.intp)]
+
+
+
+
+# Rejected rows of one frame, kept as (row position, reason code) arrays
+    # Nothing is copied until to_frame() is called, normally by load_rejected one page at a time.
+class RejectSet:
+    def __init__(self, df, positions=None, codes=None):
+        self.df = df
+        self.positions = np.asarray([] if positions is None else positions, dtype=np.int64)
+        self.codes = np.asarray([] if codes is None else codes, dtype=np.int8)
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    # {reason: count} in the order the reasons first appear (rule precedence)
+    def reason_counts(self):
+        codes, first_seen, counts = np.unique(self.codes, return_index=True, return_counts=True)
+        order = np.argsort(first_seen)
+        return dict(zip(reason_text(codes[order]), counts[order].tolist()))
+    
+    # Materialise rejects [start:stop] as rows of the original frame plus a rejection_reason column
+    def to_frame(self, start=0, stop=None):
+        positions = self.positions[start:stop]
+        rejects = self.df.take(positions).reset_index(drop=True)
+        rejects['rejection_reason'] = reason_text(self.codes[start:stop])
+        return rejects
+
+
+# Declared rules
+    # {"column": ..., "check": ..., "reason": optional text, plus the check's options}, in precedence order:
+    #   not_null                        value is present
+    #   non_empty                       present and not blank
+    #   range      "min" / "max"        min <= value <= max
+    #   regex      "pattern"            the whole value matches the pattern
+    #   in         "values"             value is one of the listed values
+    #   length     "min" / "max"        min <= len(value) <= max
+    # Except for not_null / non_empty, a missing value passes (that is not_null's job).
+    # Sources declare their own list under "validation" in sources.json; these are the built-in ones.
+CRITICAL_COLUMNS = [
+    'data_date',        # Date field - required for time-based analysis
+    'ownership_type',
+    'property_type', 
+    'zip_code',
+    'address_line1'
+]
+
+REQUIRED_FIELD_RULES = [
+    {'column': 'location_id', 'check': 'not_null', 'reason': 'Missing location_id'},
+    {'column': 'city', 'check': 'non_empty'},
+    {'column': 'state', 'check': 'non_empty'},
+]
+
+NUMERIC_RANGE_RULES = [
+    {'column': 'parking_spaces', 'check': 'range', 'min': 0, 'reason': 'Negative parking_spaces'},
+]
+
+# Columns where NULL values should be rejected
+    # You can customize this list based on your business rules
+NULL_VALUE_RULES = [{'column': col, 'check': 'not_null'} for col in CRITICAL_COLUMNS]
+
+DEFAULT_RULES = REQUIRED_FIELD_RULES + NUMERIC_RANGE_RULES + NULL_VALUE_RULES
+
+DEFAULT_REASONS = {
+    'not_null': 'NULL value in {column}',
+    'non_empty': 'Missing or empty {column}',
+    'range': '{column} out of range',
+    'regex': 'Invalid {column} format',
+    'in': 'Unexpected {column} value',
+    'length': 'Invalid {column} length',
+}
+
+
+class Rule:
+    def __init__(self, column, check, reason, options):
+        self.column = column
+        self.check = check
+        self.reason = reason
+        self.options = options
+        # Whether a missing value fails this rule
+        self.fails_on_null = check in ('not_null', 'non_empty')
+        self.pattern = re.compile(options['pattern']) if check == 'regex' else None
+    
+    # Invalid flags for present (non-null) values
+    def invalid(self, values):
+        if self.check == 'not_null':
+            return np.zeros(len(values), dtype=bool)
+        if self.check == 'non_empty':
+            return (values.astype(str).str.strip() == '').to_numpy()
+        if self.check == 'range':
+            return out_of_bounds(values, self.options)
+        if self.check == 'regex':
+            return ~values.astype(str).str.fullmatch(self.pattern).to_numpy(dtype=bool)
+        if self.check == 'in':
+            return ~values.isin(self.options['values']).to_numpy()
+        return out_of_bounds(values.astype(str).str.len(), self.options)
+
+
+def out_of_bounds(values, options):
+    invalid = np.zeros(len(values), dtype=bool)
+    if options.get('min') is not None:
+        invalid |= (values < options['min']).to_numpy(dtype=bool, na_value=False)
+    if options.get('max') is not None:
+        invalid |= (values > options['max']).to_numpy(dtype=bool, na_value=False)
+    return invalid
+
+
+# Validation plan
+    # Rules are grouped by column. Text columns are factorized once and every check on that column
+    # runs over the distinct values only, then is mapped back to rows through the codes, so the cost
+    # follows the number of checks and distinct values rather than rows x rule functions.
+class ValidationPlan:
+    def __init__(self, rules):
+        self.rules = rules
+        self.columns = list(dict.fromkeys(rule.column for rule in rules))
+    
+    def __len__(self):
+        return len(self.rules)
+    
+    # [(reason, invalid_mask), ...] for the rules whose column is in df, in precedence order
+        # Each column's rules are one validate.column.<name> stage in the run report
+    def evaluate(self, df):
+        masks = {}
+        for column in self.columns:
+            if column not in df.columns:
+                continue
+            rules = {index: rule for index, rule in enumerate(self.rules) if rule.column == column}
+            with stage(f'validate.column.{column}', rows=len(df), rules=len(rules)):
+                masks.update(evaluate_column(df[column], rules))
+        return [(rule.reason, masks[index]) for index, rule in enumerate(self.rules) if index in masks]
+
+
+# {rule index: invalid mask} for the rules of one column
+def evaluate_column(series, rules):
+    masks = {}
+    missing = series.isna().to_numpy()
+    value_rules = {}
+    for index, rule in rules.items():
+        if rule.check == 'not_null':
+            masks[index] = missing
+        else:
+            value_rules[index] = rule
+    if not value_rules:
+        return masks
+    
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), pd.Series(series.cat.categories)
+    elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_datetime64_any_dtype(series.dtype):
+        codes, uniques = None, series
+    else:
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Series(uniques)
+    
+    for index, rule in value_rules.items():
+        invalid = rule.invalid(uniques)
+        if codes is None:
+            # Numbers are checked row by row; missing rows were compared as False
+            masks[index] = (invalid | missing) if rule.fails_on_null else (invalid & ~missing)
+        else:
+            # Code -1 is a missing value
+            masks[index] = np.append(invalid, rule.fails_on_null)[codes]
+    return masks
+
+
+# Compiles declared rules into a ValidationPlan; unknown checks or missing options fail here, not mid-run
+def compile_rules(declarations=None):
+    rules = []
+    for declaration in DEFAULT_RULES if declarations is None else declarations:
+        declaration = dict(declaration)
+        column = declaration.pop('column')
+        check = declaration.pop('check')
+        if check not in DEFAULT_REASONS:
+            raise ValueError(f"Unknown validation check for {column}: {check}")
+        if check == 'regex' and 'pattern' not in declaration:
+            raise ValueError(f"regex rule for {column} needs a pattern")
+        if check == 'in' and 'values' not in declaration:
+            raise ValueError(f"in rule for {column} needs values")
+        if check in ('range', 'length') and declaration.get('min') is None and declaration.get('max') is None:
+            raise ValueError(f"{check} rule for {column} needs min or max")
+        reason = declaration.pop('reason', None) or DEFAULT_REASONS[check].format(column=column)
+        reason_code(reason)
+        rules.append(Rule(column, check, reason, declaration))
+    return ValidationPlan(rules)
+
+
+# The plan for a source: its "validation" block, or the built-in rules when it has none
+    # "validation": {"rules": [...], "use_defaults": false}; use_defaults keeps the built-in rules first
+def validation_plan(source_config=None):
+    validation = (source_config or {}).get('validation')
+    if validation is None:
+        return DEFAULT_PLAN
+    declarations = list(validation.get('rules', []))
+    if validation.get('use_defaults', False):
+        declarations = DEFAULT_RULES + declarations
+    return compile_rules(declarations)
+
+
+DEFAULT_PLAN = compile_rules(DEFAULT_RULES)
+
+
+# Rule builders
+    # Each one returns (rejection_reason, invalid_mask) pairs in precedence order.
+    # Masks are computed once over the whole frame; split_by_rules decides which rule a row fails first.
+def required_field_rules(df):
+    return compile_rules(REQUIRED_FIELD_RULES).evaluate(df)
+
+
+def numeric_range_rules(df):
+    return compile_rules(NUMERIC_RANGE_RULES).evaluate(df)
+
+
+def null_value_rules(df):
+    return compile_rules(NULL_VALUE_RULES).evaluate(df)
+
+
+# Rule engine
+    # Assigns every row the first rule it fails in one vectorized pass.
+    # Valid rows are split off with a single take; rejects stay as positions + reason codes.
+def split_by_rules(df, rules):
+    if len(rules) == 0 or len(df) == 0:
+        return df.copy(), RejectSet(df)
+    
+    rule_codes = np.array([reason_code(reason) for reason, _ in rules], dtype=np.int8)
+    masks = [mask.to_numpy(dtype=bool, na_value=False) if isinstance(mask, pd.Series) else np.asarray(mask, dtype=bool)
+             for _, mask in rules]
+    
+    # np.select picks the first condition that is True, so list order = precedence
+    failed_rule = np.select(masks, np.arange(len(rules)), default=-1)
+    failed = failed_rule >= 0
+    
+    valid_df = df.take(np.flatnonzero(~failed))
+    if not failed.any():
+        return valid_df, RejectSet(df)
+    
+    # Group rejects by rule (then by original row order), the same order the validators always produced
+    reject_positions = np.flatnonzero(failed)
+    reject_positions = reject_positions[np.argsort(failed_rule[reject_positions], kind='stable')]
+    
+    return valid_df, RejectSet(df, reject_positions, rule_codes[failed_rule[reject_positions]])
+
 
 # Function 01
 def validate_required_fields(df):
-    valid_mask = pd.Series([True] * len(df), index=df.index)
-    all_rejects = pd.DataFrame()
-    
-    # Rule 1: location_id must not be null
-    if 'location_id' in df.columns:
-        invalid_mask = df['location_id'].isna()
-        if invalid_mask.any():
-            rejects = df[invalid_mask].copy()
-            rejects['rejection_reason'] = 'Missing location_id'
-            all_rejects = pd.concat([all_rejects,rejects], ignore_index=True)
-            valid_mask = valid_mask & ~invalid_mask
-    
-    # Rule 2: city must not be null or empty
-    if 'city' in df.columns:
-        invalid_mask = (df['city'].isna()) | (df['city'].str.strip() == '')
-        if invalid_mask.any():
-            rejects = df[invalid_mask & valid_mask].copy()
-            rejects['rejection_reason'] = 'Missing or empty city'
-            all_rejects = pd.concat([all_rejects, rejects], ignore_index=True)
-            valid_mask = valid_mask & ~invalid_mask
-            
-    # Rule 3: state must not be null or empty
-    if 'state' in df.columns:
-        invalid_mask = (df['state'].isna()) | (df['state'].str.strip() == '')
-        if invalid_mask.any():
-            rejects = df[invalid_mask & valid_mask].copy()
-            rejects['rejection_reason'] = 'Missing or empty state'
-            all_rejects = pd.concat([all_rejects, rejects], ignore_index=True)
-            valid_mask = valid_mask & ~invalid_mask
-    
-    # Split into valid and invalid
-    valid_df = df[valid_mask].copy()
+    valid_df, all_rejects = split_by_rules(df, required_field_rules(df))
     
     # print(f"✅ Required fields validation: {len(valid_df)} valid, {len(all_rejects)} rejected")
     logger.info(f"✅ Required fields validation: {len(valid_df)} valid, {len(all_rejects)} rejected")
@@ -51,22 +288,7 @@ def validate_required_fields(df):
 
 # Function 02   
 def validate_numeric_ranges(df):
-    # Start with all rows as valid  
-    valid_mask = pd.Series([True] * len(df), index=df.index)
-    all_rejects = pd.DataFrame()
-    
-    # Rule: parking_spaces must be >= 0 (if not null)
-    if 'parking_spaces' in df.columns:
-        # Check for negative values (but allow nulls)
-        invalid_mask = (df['parking_spaces'].notna()) & (df['parking_spaces'] < 0)
-        if invalid_mask.any():
-            rejects = df[invalid_mask].copy()
-            rejects['rejection_reason'] = 'Negative parking_spaces'
-            all_rejects = pd.concat([all_rejects, rejects], ignore_index=True)
-            valid_mask = valid_mask & ~invalid_mask
-    
-    # Split into valid and invalid
-    valid_df = df[valid_mask].copy()
+    valid_df, all_rejects = split_by_rules(df, numeric_range_rules(df))
     
     logger.info(f"✅ Numeric range validation: {len(valid_df)} valid, {len(all_rejects)} rejected")
     
@@ -75,35 +297,7 @@ def validate_numeric_ranges(df):
 
 # Function 03: Validate NULL values in important columns
 def validate_null_values(df):
-    # Start with all rows as valid
-    valid_mask = pd.Series([True] * len(df), index=df.index)
-    all_rejects = pd.DataFrame()
-    
-    # Define columns where NULL values should be rejected
-    # You can customize this list based on your business rules
-    critical_columns = [
-        'data_date',        # Date field - required for time-based analysis
-        'ownership_type',
-        'property_type', 
-        'zip_code',
-        'address_line1'
-    ]
-    
-    # Check each critical column for NULL values
-    for col in critical_columns:
-        if col in df.columns:
-            # Find rows with NULL values in this column
-            invalid_mask = df[col].isna()
-            if invalid_mask.any():
-                # Get only the rows that are still valid and have NULL in this column
-                rejects = df[invalid_mask & valid_mask].copy()
-                rejects['rejection_reason'] = f'NULL value in {col}'
-                all_rejects = pd.concat([all_rejects, rejects], ignore_index=True)
-                # Mark these rows as invalid
-                valid_mask = valid_mask & ~invalid_mask
-    
-    # Split into valid and invalid
-    valid_df = df[valid_mask].copy()
+    valid_df, all_rejects = split_by_rules(df, null_value_rules(df))
     
     logger.info(f"✅ NULL value validation: {len(valid_df)} valid, {len(all_rejects)} rejected")
     
@@ -163,27 +357,28 @@ if __name__=="__main__": # pragma: no cover
     print("="*60)
     valid_df = remove_duplicates(valid_df, 'location_id')
     
-    # Combine all rejects
-    all_rejects = pd.concat([rejects_required, rejects_numeric], ignore_index=True)
-    
     # Summary
+    rejected_count = len(rejects_required) + len(rejects_numeric)
     print("\n" + "="*60)
     print("VALIDATION SUMMARY")
     print("="*60)
     print(f"✅ Valid records: {len(valid_df)}")
-    print(f"❌ Rejected records: {len(all_rejects)}")
+    print(f"❌ Rejected records: {rejected_count}")
     print(f"📊 Success rate: {len(valid_df) / len(df) * 100:1f}%")
     
-    if len(all_rejects) > 0:
+    if rejected_count > 0:
         print("\n"+"="*60)
         print("REJECTION REASONS:")
         print("="*60)
-        print(all_rejects['rejection_reason'].value_counts())
+        for rejects in (rejects_required, rejects_numeric):
+            for reason, count in rejects.reason_counts().items():
+                print(f"{reason}: {count}")
         
         print("\n"+"="*60)
         print("SAMPLE REHJECTED RECORDS:")
         print("="*60)
-        print(all_rejects[['location_id', 'city', 'state', 'rejection_reason']].head(5))
+        sample = rejects_required if len(rejects_required) > 0 else rejects_numeric
+        print(sample.to_frame(0, 5)[['location_id', 'city', 'state', 'rejection_reason']])
     
     
     
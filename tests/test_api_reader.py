@@ -0,0 +1,108 @@
+import pytest
+import json
+import threading
+import sys
+import os
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from readers.api_reader import read_api
+
+
+# 7 records served 3 per page → pages 1, 2, 3 (short) and empty pages after that
+RECORDS = [
+    {"location": {"id": f"CT{i:04d}", "address": {"city": "HARTFORD"}}, "data": {"parking spaces": i}}
+    for i in range(7)
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    fail_once = set()
+    requested = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if not self.path.startswith('/properties'):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query['page'][0])
+        page_size = int(query['page_size'][0])
+
+        with StubHandler.lock:
+            StubHandler.requested.append(page)
+            should_fail = page in StubHandler.fail_once
+            StubHandler.fail_once.discard(page)
+
+        if should_fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        start = (page - 1) * page_size
+        body = json.dumps({"results": RECORDS[start:start + page_size]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.fail_once = set()
+    StubHandler.requested = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/properties"
+    server.shutdown()
+    server.server_close()
+
+
+class TestReadApi:
+    
+    def test_reads_all_pages_in_order(self, stub_server):
+        df = read_api(stub_server, page_size=3, fetch_workers=2, records_key='results')
+        
+        assert len(df) == 7
+        assert df['location.id'].tolist() == [f"CT{i:04d}" for i in range(7)]
+        assert df.index.tolist() == list(range(7))
+        assert 'location.address.city' in df.columns
+        
+    def test_pages_are_chunks(self, stub_server):
+        chunks = list(read_api(stub_server, chunksize=True, page_size=3, fetch_workers=3, records_key='results'))
+        
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        
+    def test_stops_after_short_page(self, stub_server):
+        list(read_api(stub_server, chunksize=True, page_size=3, fetch_workers=2, records_key='results'))
+        
+        # Page 3 is short; at most fetch_workers - 1 look-ahead requests go past it
+        assert max(StubHandler.requested) <= 4
+        
+    def test_retries_server_errors(self, stub_server):
+        StubHandler.fail_once = {2}
+        
+        df = read_api(stub_server, page_size=3, fetch_workers=2, records_key='results', backoff=0)
+        
+        assert len(df) == 7
+        assert StubHandler.requested.count(2) == 2
+        
+    def test_schema_applied_to_pages(self, stub_server):
+        schema = {"location.id": {"dtype": "string"}, "data.parking spaces": {"dtype": "Int16"}}
+        
+        df = read_api(stub_server, page_size=3, records_key='results', schema=schema)
+        
+        assert list(df.columns) == ['location.id', 'data.parking spaces']
+        assert str(df['data.parking spaces'].dtype) == 'Int16'
+        
+    def test_http_error_raises(self, stub_server):
+        with pytest.raises(Exception):
+            read_api(stub_server.replace('/properties', '/missing'), page_size=3, retries=0)
@@ -5,7 +5,8 @@ import os
 
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-from clean import rename_columns, strip_whitespace, handle_missing_values, convert_date_format
+from clean import rename_columns, strip_whitespace, handle_missing_values, convert_date_format, transform_strings, strip_values, compile_clean_plan
+import metrics
 
 class TestRenameColumns:
     
@@ -94,10 +95,134 @@ class TestConvertDataFormat:
         assert pd.isna(result['data_date'].iloc[2])
         assert pd.isna(result['data_date'].iloc[3])
         
+    def test_convert_date_format_explicit_format(self):
+        df = pd.DataFrame({'data_date': ['1933.1.1', '2001.12.31', '1999.13.1']})
+        
+        result = convert_date_format(df, '%Y.%m.%d')
+        
+        assert result['data_date'].iloc[0] == pd.Timestamp('1933-01-01')
+        assert result['data_date'].iloc[1] == pd.Timestamp('2001-12-31')
+        assert pd.isna(result['data_date'].iloc[2])
+        
     def test_covert_date_format_no_column(self):
         df = pd.DataFrame({'city': ['NYC']})
         result = convert_date_format(df)
         assert 'data_date' not in result.columns
                 
                 
-                
\ No newline at end of file
+                
+
+class TestStripWhitespaceTypedColumns:
+    
+    def test_strip_categorical_column(self):
+        df = pd.DataFrame({'state': pd.Categorical([' CT', 'CT ', 'MA'])})
+        
+        result = strip_whitespace(df)
+        
+        assert result['state'].tolist() == ['CT', 'CT', 'MA']
+        assert isinstance(result['state'].dtype, pd.CategoricalDtype)
+        
+    def test_strip_string_dtype_column(self):
+        df = pd.DataFrame({'city': pd.array([' Hartford ', None], dtype='string')})
+        
+        result = strip_whitespace(df)
+        
+        assert result['city'].tolist()[0] == 'Hartford'
+        assert pd.isna(result['city'].tolist()[1])
+
+
+class TestTransformStrings:
+    
+    def test_function_sees_only_distinct_values(self):
+        series = pd.Series([' CT', 'MA ', ' CT', None, 'MA '] * 100, index=range(10, 510), name='state')
+        seen = []
+        
+        def strip_and_record(values):
+            seen.append(len(values))
+            return values.str.strip()
+        
+        result = transform_strings(series, strip_and_record)
+        
+        assert seen == [2]
+        assert result.iloc[:5].fillna('<null>').tolist() == ['CT', 'MA', 'CT', '<null>', 'MA']
+        assert result.index.equals(series.index)
+        assert result.name == 'state'
+        
+    def test_keeps_string_dtype(self):
+        series = pd.Series([' a', ' a', None, ' a'], dtype='string')
+        
+        result = transform_strings(series, strip_values)
+        
+        assert result.dtype == series.dtype
+        assert result.tolist()[0] == 'a'
+        assert pd.isna(result.iloc[2])
+        
+    def test_as_category_merges_values(self):
+        series = pd.Series([' CT', 'CT ', 'MA', None, 'MA'])
+        
+        result = transform_strings(series, strip_values, as_category=True)
+        
+        assert isinstance(result.dtype, pd.CategoricalDtype)
+        assert list(result.cat.categories) == ['CT', 'MA']
+        assert result.cat.codes.tolist() == [0, 0, 1, -1, 1]
+        
+    def test_mostly_unique_column_transformed_directly(self):
+        series = pd.Series([f' id{i} ' for i in range(10)])
+        
+        result = transform_strings(series, strip_values)
+        
+        assert result.tolist() == [f'id{i}' for i in range(10)]
+
+
+class TestCleanPlan:
+    
+    @pytest.fixture
+    def raw(self):
+        return pd.DataFrame({
+            'location.id': [' CT001', 'CT002 ', 'CT003'],
+            'location.address.city': [' Hartford', 'Hartford ', None],
+            'data.date': [' 1933.1.1', '0', '2001.12.31'],
+            'data.parking spaces': [1, 2, 3]
+        }, index=[7, 8, 9])
+    
+    def test_same_result_as_the_four_functions(self, raw):
+        expected = convert_date_format(handle_missing_values(strip_whitespace(rename_columns(raw.copy()))))
+        
+        result = compile_clean_plan().apply(raw)
+        
+        pd.testing.assert_frame_equal(result, expected)
+        
+    def test_input_frame_untouched(self, raw):
+        before = raw.copy()
+        
+        compile_clean_plan().apply(raw)
+        
+        pd.testing.assert_frame_equal(raw, before)
+        
+    def test_plan_from_source_config(self, raw):
+        source_config = {
+            'date_format': '%Y.%m.%d',
+            'clean': {'rename': {'location.address.city': 'town'}, 'placeholders': {'town': ['Hartford']}}
+        }
+        
+        result = compile_clean_plan(source_config).apply(raw)
+        
+        assert 'town' in result.columns
+        assert result['town'].isna().all()
+        assert result['data_date'].iloc[0] == pd.Timestamp('1933-01-01')
+        assert pd.isna(result['data_date'].iloc[1])
+        
+    def test_strip_can_be_turned_off(self, raw):
+        result = compile_clean_plan({'clean': {'strip': False}}).apply(raw)
+        
+        assert result['location_id'].tolist() == [' CT001', 'CT002 ', 'CT003']
+        
+    def test_per_column_timing(self, raw):
+        report = metrics.start_run()
+        
+        compile_clean_plan(defaults={'metrics': {'clean_columns': True}}).apply(raw)
+        metrics.finish_run()
+        
+        stages = [record['stage'] for record in report.stages]
+        assert stages == ['clean.column.location_id', 'clean.column.city', 'clean.column.data_date',
+                          'clean.column.parking_spaces']
@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from compact import compact_frame, compact_column, downcast_integers
+from load import to_copy_lines
+
+
+@pytest.fixture
+def cleaned():
+    rows = 1000
+    return pd.DataFrame({
+        'location_id': [f'CT{i:04d}' for i in range(rows)],
+        'city': ['Hartford', 'New Haven', None, 'Stamford'] * (rows // 4),
+        'parking_spaces': [0.0, 12.0, np.nan, 300.0] * (rows // 4),
+        'region_id': np.array([1, 2, 3, 4] * (rows // 4), dtype='int64'),
+        'data_date': pd.to_datetime(['2024-01-01'] * rows)
+    })
+
+
+class TestCompactFrame:
+
+    def test_dtypes(self, cleaned):
+        result, report = compact_frame(cleaned, keep=('location_id',))
+
+        assert result['location_id'].dtype == object
+        assert isinstance(result['city'].dtype, pd.CategoricalDtype)
+        assert result['parking_spaces'].dtype == 'Int16'
+        assert result['region_id'].dtype == 'Int8'
+        assert result['data_date'].dtype == cleaned['data_date'].dtype
+        assert report['columns'] == {'city': 'category', 'parking_spaces': 'Int16', 'region_id': 'Int8'}
+
+    def test_reports_bytes(self, cleaned):
+        result, report = compact_frame(cleaned)
+
+        assert report['bytes_before'] == cleaned.memory_usage(index=False, deep=True).sum()
+        assert report['bytes_after'] == result.memory_usage(index=False, deep=True).sum()
+        assert report['bytes_after'] < report['bytes_before']
+
+    def test_values_and_copy_text_unchanged(self, cleaned):
+        result, _ = compact_frame(cleaned)
+
+        assert result['city'].isna().sum() == cleaned['city'].isna().sum()
+        assert pd.isna(result['parking_spaces'].iloc[2])
+        assert (to_copy_lines(result) == to_copy_lines(cleaned)).all()
+
+    def test_nothing_to_compact_returns_same_frame(self):
+        df = pd.DataFrame({'ratio': [0.5, 1.5], 'location_id': ['A', 'B']})
+
+        result, report = compact_frame(df)
+
+        assert result is df
+        assert report['columns'] == {}
+
+
+class TestCompactColumn:
+
+    def test_high_cardinality_text_stays(self):
+        series = pd.Series(['a', 'b', 'c', 'a'])
+
+        assert compact_column(series, max_category_ratio=0.5) is series
+
+    def test_object_integers(self):
+        result = compact_column(pd.Series([1, None, 70000], dtype=object))
+
+        assert result.dtype == 'Int32'
+        assert result.tolist()[2] == 70000
+
+    @pytest.mark.parametrize('low, high, expected', [
+        (-128, 127, 'Int8'),
+        (0, 128, 'Int16'),
+        (-40000, 0, 'Int32'),
+        (0, 2**40, 'Int64'),
+    ])
+    def test_smallest_integer_type(self, low, high, expected):
+        assert downcast_integers(pd.Series([low, high])).dtype == expected
+
+    @pytest.mark.parametrize('series', [
+        pd.Series([1, None, 2**70], dtype=object),
+        pd.Series([1.0, None, 1e20]),
+        pd.Series([-1e19, 0.0]),
+    ])
+    def test_values_beyond_int64_are_left_alone(self, series):
+        assert compact_column(series) is series
@@ -0,0 +1,218 @@
+import pytest
+import pandas as pd
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import dates
+from readers import csv_read
+from readers.csv_read import read_csv, read_options_from_schema
+from rules import apply_all_validations
+from validate import compile_rules
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    path = tmp_path / "sample.csv"
+    path.write_text(
+        '"data.date","data.status","data.parking spaces","location.id","location.address.zip"\n'
+        '"1933.1.1","ACTIVE","29","CT0013","06103"\n'
+        '"0","ACTIVE","","CT0024","06510"\n'
+        '"2019.12.1","EXCESS","3","CT0031","06604"\n'
+    )
+    return str(path)
+
+
+SCHEMA = {
+    "data.date": {"dtype": "date", "format": "%Y.%m.%d"},
+    "data.status": {"dtype": "category"},
+    "data.parking spaces": {"dtype": "Int32"},
+    "location.id": {"dtype": "string"},
+    "location.address.zip": {"dtype": "string", "load": False}
+}
+
+
+class TestReadCsv:
+    
+    def test_read_whole_file(self, sample_csv):
+        df = read_csv(sample_csv)
+        
+        assert len(df) == 3
+        assert df['data.date'].tolist() == ['1933.1.1', '0', '2019.12.1']
+        
+    def test_read_in_chunks(self, sample_csv):
+        chunks = list(read_csv(sample_csv, chunksize=2))
+        
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert chunks[1]['location.id'].tolist() == ['CT0031']
+        
+    def test_schema_dtypes_and_projection(self, sample_csv):
+        df = read_csv(sample_csv, schema=SCHEMA)
+        
+        assert 'location.address.zip' not in df.columns
+        assert isinstance(df['data.status'].dtype, pd.CategoricalDtype)
+        assert str(df['data.parking spaces'].dtype) == 'Int32'
+        assert df['data.parking spaces'].isna().tolist() == [False, True, False]
+        
+    def test_schema_dates_use_explicit_format(self, sample_csv):
+        df = read_csv(sample_csv, schema=SCHEMA)
+        
+        assert df['data.date'].tolist()[0] == pd.Timestamp('1933-01-01')
+        assert pd.isna(df['data.date'].tolist()[1])
+        assert df['data.date'].tolist()[2] == pd.Timestamp('2019-12-01')
+        
+    def test_date_placeholder_is_not_logged_as_coerced(self, sample_csv):
+        with patch.object(dates.logger, 'warning') as warning:
+            df = read_csv(sample_csv, schema=SCHEMA)
+        
+        assert pd.isna(df['data.date'].tolist()[1])
+        warning.assert_not_called()
+        
+    def test_schema_applies_to_chunks(self, sample_csv):
+        chunks = list(read_csv(sample_csv, chunksize=2, schema=SCHEMA))
+        
+        assert all(isinstance(chunk['data.status'].dtype, pd.CategoricalDtype) for chunk in chunks)
+        assert chunks[1]['data.date'].tolist() == [pd.Timestamp('2019-12-01')]
+        
+    def test_no_schema_means_no_options(self):
+        assert read_options_from_schema(None) == ({}, {})
+
+
+class TestReadCsvArrowEngine:
+    
+    def test_arrow_backed_columns(self, sample_csv):
+        df = read_csv(sample_csv, engine='pyarrow')
+        
+        assert len(df) == 3
+        assert str(df['location.id'].dtype) == 'string[pyarrow]'
+        assert df['location.id'].tolist() == ['CT0013', 'CT0024', 'CT0031']
+        
+    def test_arrow_schema_keeps_strings_arrow_backed(self, sample_csv):
+        df = read_csv(sample_csv, schema=SCHEMA, engine='pyarrow')
+        
+        assert df['location.id'].dtype == 'string[pyarrow]'
+        assert isinstance(df['data.status'].dtype, pd.CategoricalDtype)
+        assert 'location.address.zip' not in df.columns
+        assert df['data.date'].tolist()[0] == pd.Timestamp('1933-01-01')
+        
+    def test_arrow_chunks_are_fixed_size(self, sample_csv):
+        chunks = list(read_csv(sample_csv, chunksize=2, schema=SCHEMA, engine='pyarrow'))
+        
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert chunks[1].index.tolist() == [2]
+        assert chunks[1]['location.id'].tolist() == ['CT0031']
+        assert str(chunks[0]['data.parking spaces'].dtype) == 'Int32'
+
+
+    @pytest.fixture
+    def late_mismatch_csv(self, tmp_path):
+        # Arrow infers column types from its first block (about 1 MB); the odd zip comes long after
+        path = tmp_path / "late.csv"
+        rows = ''.join(f'"CT{i:06d}","{6000 + i % 1000}","{i % 50}"\n' for i in range(60000))
+        path.write_text('"location.id","location.address.zip","data.parking spaces"\n'
+                        + rows + '"CT999999","06103-1125",""\n')
+        return str(path)
+    
+    def test_arrow_chunks_survive_type_change_after_first_block(self, late_mismatch_csv):
+        # The zip is declared without a dtype, so Arrow must not infer int64 from the first block
+        schema = {"location.id": {"dtype": "string"}, "location.address.zip": {},
+                  "data.parking spaces": {"dtype": "Int16"}}
+        
+        chunks = list(read_csv(late_mismatch_csv, chunksize=20000, schema=schema, engine='pyarrow'))
+        
+        assert sum(len(chunk) for chunk in chunks) == 60001
+        assert chunks[-1]['location.address.zip'].tolist()[-1] == '06103-1125'
+        assert str(chunks[-1]['data.parking spaces'].dtype) == 'Int16'
+        
+    def test_arrow_chunks_without_schema_fall_back_to_pandas(self, late_mismatch_csv):
+        with patch.object(csv_read.logger, 'warning') as warning:
+            chunks = list(read_csv(late_mismatch_csv, chunksize=20000, engine='pyarrow'))
+        
+        assert "needs a schema" in warning.call_args[0][0]
+        assert sum(len(chunk) for chunk in chunks) == 60001
+        assert chunks[-1]['location.address.zip'].tolist()[-1] == '06103-1125'
+
+
+    @pytest.mark.parametrize('chunksize', [None, 2])
+    def test_empty_text_fields_are_null_with_both_engines(self, tmp_path, chunksize):
+        path = tmp_path / "blanks.csv"
+        path.write_text(
+            '"location.id","location.address.zip","location.address.line 1"\n'
+            '"CT001","06103","1 MAIN ST"\n'
+            '"CT002","","2 ELM ST"\n'
+            '"CT003","06510",""\n'
+            '"CT004","NA","4 OAK ST"\n'
+        )
+        schema = {"location.id": {"dtype": "string"}, "location.address.zip": {"dtype": "string"},
+                  "location.address.line 1": {"dtype": "string"}}
+        plan = compile_rules([{'column': 'location.address.zip', 'check': 'not_null'},
+                              {'column': 'location.address.line 1', 'check': 'not_null'}])
+        
+        def split(engine):
+            df = read_csv(str(path), chunksize=chunksize, schema=schema, engine=engine)
+            if chunksize:
+                df = pd.concat(list(df))
+            valid_df, rejects = apply_all_validations(df, primary_key='location.id', plan=plan)
+            return valid_df['location.id'].tolist(), sorted(rejects.to_frame()['location.id'].tolist())
+        
+        assert split('pyarrow') == split(None) == (['CT001'], ['CT002', 'CT003', 'CT004'])
+
+
+    @pytest.mark.parametrize('chunksize', [None, 2])
+    def test_string_zip_keeps_leading_zeros(self, sample_csv, chunksize):
+        schema = {**SCHEMA, "location.address.zip": {"dtype": "string"}}
+        
+        df = read_csv(sample_csv, chunksize=chunksize, schema=schema, engine='pyarrow')
+        if chunksize:
+            df = pd.concat(list(df))
+        
+        assert df['location.address.zip'].tolist() == ['06103', '06510', '06604']
+
+
+class TestReadCsvFromOffset:
+    
+    @pytest.fixture
+    def offset(self, sample_csv):
+        # Byte offset just past the second data row
+        with open(sample_csv, 'rb') as the_file:
+            the_file.readline()
+            the_file.readline()
+            the_file.readline()
+            return the_file.tell()
+    
+    @pytest.mark.parametrize('engine', [None, 'pyarrow'])
+    def test_only_rows_after_offset_with_header(self, sample_csv, offset, engine):
+        df = read_csv(sample_csv, schema=SCHEMA, engine=engine, offset=offset)
+        
+        assert list(df.columns) == ['data.date', 'data.status', 'data.parking spaces', 'location.id']
+        assert df['location.id'].tolist() == ['CT0031']
+        assert df['data.date'].tolist() == [pd.Timestamp('2019-12-01')]
+    
+    @pytest.mark.parametrize('engine', [None, 'pyarrow'])
+    def test_chunks_from_offset(self, sample_csv, engine):
+        with open(sample_csv, 'rb') as the_file:
+            offset = len(the_file.readline())
+        
+        chunks = list(read_csv(sample_csv, chunksize=2, engine=engine, offset=offset))
+        
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert chunks[1]['location.id'].tolist() == ['CT0031']
+    
+    @pytest.mark.parametrize('engine', [None, 'pyarrow'])
+    @pytest.mark.parametrize('chunksize', [None, 2])
+    def test_stops_at_end(self, sample_csv, engine, chunksize):
+        with open(sample_csv, 'rb') as the_file:
+            header = the_file.readline()
+            first_row = the_file.readline()
+            second_row = the_file.readline()
+        
+        # Offset 0 up to the end of the first row, then the second row alone
+        first = read_csv(sample_csv, chunksize=chunksize, schema=SCHEMA, engine=engine, end=len(header + first_row))
+        second = read_csv(sample_csv, chunksize=chunksize, schema=SCHEMA, engine=engine,
+                          offset=len(header + first_row), end=len(header + first_row + second_row))
+        if chunksize:
+            first, second = pd.concat(list(first)), pd.concat(list(second))
+        
+        assert first['location.id'].tolist() == ['CT0013']
+        assert second['location.id'].tolist() == ['CT0024']
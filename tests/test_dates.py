@@ -0,0 +1,78 @@
+import pandas as pd
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import dates
+from dates import parse_dates
+
+
+class TestParseDates:
+
+    def test_explicit_format(self):
+        series = pd.Series(['1933.1.1', '2001.12.31', None], index=[5, 6, 7], name='data_date')
+
+        parsed, coerced = parse_dates(series, '%Y.%m.%d')
+
+        assert parsed.tolist()[:2] == [pd.Timestamp('1933-01-01'), pd.Timestamp('2001-12-31')]
+        assert pd.isna(parsed.iloc[2])
+        assert parsed.index.tolist() == [5, 6, 7]
+        assert parsed.name == 'data_date'
+        # Missing values are not coercions
+        assert coerced == {}
+
+    def test_each_distinct_value_parsed_once(self):
+        series = pd.Series(['1933.1.1', '2001.12.31'] * 5000)
+
+        with patch('dates.pd.to_datetime', wraps=pd.to_datetime) as to_datetime:
+            parsed, _ = parse_dates(series, '%Y.%m.%d')
+
+        assert len(to_datetime.call_args[0][0]) == 2
+        assert parsed.iloc[-1] == pd.Timestamp('2001-12-31')
+
+    def test_coerced_counts_by_original_value(self):
+        series = pd.Series(['0', '1933.1.1', '1999.13.1', '0', None, '0'], dtype='string')
+
+        parsed, coerced = parse_dates(series, '%Y.%m.%d')
+
+        assert parsed.isna().sum() == 5
+        assert list(coerced.items()) == [('0', 3), ('1999.13.1', 1)]
+
+    def test_placeholders_become_nat_without_being_reported(self):
+        series = pd.Series(['0', '1933.1.1', '1999.13.1', '0'], dtype='string[pyarrow]')
+
+        parsed, coerced = parse_dates(series, '%Y.%m.%d', missing=dates.MISSING_DATES)
+
+        assert parsed.isna().tolist() == [True, False, True, True]
+        assert coerced == {'1999.13.1': 1}
+
+    def test_datetime_column_unchanged(self):
+        series = pd.Series(pd.to_datetime(['2024-01-01']))
+
+        parsed, coerced = parse_dates(series, '%Y.%m.%d')
+
+        assert parsed is series
+        assert coerced == {}
+
+    def test_categorical_input(self):
+        series = pd.Series(pd.Categorical(['1933.1.1', '0', '1933.1.1']))
+
+        parsed, coerced = parse_dates(series, '%Y.%m.%d')
+
+        assert parsed.iloc[2] == pd.Timestamp('1933-01-01')
+        assert coerced == {'0': 1}
+
+
+class TestLogCoerced:
+
+    def test_top_values_logged(self):
+        coerced = {f'bad{i}': 20 - i for i in range(12)}
+
+        with patch.object(dates.logger, 'warning') as warning:
+            dates.log_coerced('data_date', coerced)
+
+        message = warning.call_args[0][0]
+        assert "data_date: 174 values coerced to NaT" in message
+        assert "'bad0' x20" in message and "'bad10'" not in message
+        assert "+2 more distinct values" in message
@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from executor import run_pipelined
+
+
+class TestRunPipelined:
+
+    def test_every_chunk_passes_every_stage_in_order(self):
+        loaded = []
+
+        report = run_pipelined(
+            range(10),
+            [('transform', lambda item: item * 10), ('load', loaded.append)]
+        )
+
+        assert loaded == [item * 10 for item in range(10)]
+        assert [record['stage'] for record in report] == ['extract', 'transform', 'load']
+        assert all(record['items'] == 10 for record in report)
+
+    def test_stages_overlap(self):
+        def slow_chunks():
+            for item in range(6):
+                time.sleep(0.05)
+                yield item
+
+        def slow(item):
+            time.sleep(0.05)
+            return item
+
+        started = time.perf_counter()
+        report = run_pipelined(slow_chunks(), [('transform', slow), ('load', slow)])
+        wall_seconds = time.perf_counter() - started
+
+        # Serially this takes 3 stages x 6 chunks x 0.05s = 0.9s
+        assert wall_seconds < 0.7
+        assert all(record['utilisation'] > 0.3 for record in report)
+
+    def test_bounded_queues_hold_back_the_producer(self):
+        produced = []
+        lead = []
+        loaded = []
+
+        def chunks():
+            for item in range(20):
+                produced.append(item)
+                lead.append(len(produced) - len(loaded))
+                yield item
+
+        def slow_load(item):
+            time.sleep(0.01)
+            loaded.append(item)
+
+        report = run_pipelined(chunks(), [('transform', lambda item: item), ('load', slow_load)], queue_size=1)
+
+        # One chunk in each queue plus one in each stage is the most the producer can run ahead
+        assert max(lead) <= 5
+        assert report[0]['blocked_seconds'] > 0
+        assert loaded == list(range(20))
+
+    def test_error_stops_every_stage(self):
+        produced = []
+        closed = threading.Event()
+
+        def chunks():
+            try:
+                for item in range(1000):
+                    produced.append(item)
+                    yield item
+            finally:
+                closed.set()
+
+        def failing_load(item):
+            if item == 3:
+                raise ValueError("Load failed")
+
+        with pytest.raises(ValueError, match="Load failed"):
+            run_pipelined(chunks(), [('transform', lambda item: item), ('load', failing_load)])
+
+        assert closed.is_set()
+        assert len(produced) < 1000
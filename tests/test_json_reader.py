@@ -0,0 +1,116 @@
+import pytest
+import json
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import readers.json_reader as json_reader
+from readers.json_reader import read_json
+
+
+RECORDS = [
+    {
+        "data": {"date": "1933.1.1", "status": "ACTIVE", "parking spaces": 29},
+        "location": {"id": "CT0013", "address": {"city": "HARTFORD", "state": "CT"}}
+    },
+    {
+        "data": {"date": "0", "status": "ACTIVE", "parking spaces": 0},
+        "location": {"id": "CT0024", "address": {"city": "NEW HAVEN", "state": "CT"}}
+    },
+    {
+        "data": {"date": "2019.1.1", "status": "EXCESS", "parking spaces": 3},
+        "location": {"id": "CT0031", "address": {"city": "BRIDGEPORT, \"EAST\"", "state": "CT"}}
+    }
+]
+
+
+@pytest.fixture
+def ndjson_file(tmp_path):
+    path = tmp_path / "sample.ndjson"
+    path.write_text("\n".join(json.dumps(record) for record in RECORDS) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def array_file(tmp_path):
+    path = tmp_path / "sample.json"
+    path.write_text(json.dumps(RECORDS, indent=2))
+    return str(path)
+
+
+class TestReadJson:
+    
+    def test_ndjson_flattens_to_dotted_columns(self, ndjson_file):
+        df = read_json(ndjson_file)
+        
+        assert len(df) == 3
+        assert 'location.address.city' in df.columns
+        assert 'data.parking spaces' in df.columns
+        assert df['location.id'].tolist() == ['CT0013', 'CT0024', 'CT0031']
+        
+    def test_array_matches_ndjson(self, ndjson_file, array_file):
+        pd.testing.assert_frame_equal(read_json(array_file), read_json(ndjson_file))
+        
+    def test_array_across_small_read_blocks(self, array_file, monkeypatch):
+        # Every record straddles several reads
+        monkeypatch.setattr(json_reader, 'READ_BLOCK_SIZE', 7)
+        
+        df = read_json(array_file)
+        
+        assert df['location.address.city'].tolist() == ['HARTFORD', 'NEW HAVEN', 'BRIDGEPORT, "EAST"']
+        
+    def test_chunks(self, array_file):
+        chunks = list(read_json(array_file, chunksize=2))
+        
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert chunks[1].index.tolist() == [2]
+        
+    def test_schema(self, ndjson_file):
+        schema = {
+            "data.date": {"dtype": "date", "format": "%Y.%m.%d"},
+            "data.status": {"dtype": "category"},
+            "location.id": {"dtype": "string"},
+            "location.address.state": {"dtype": "category", "load": False}
+        }
+        
+        df = read_json(ndjson_file, schema=schema)
+        
+        assert list(df.columns) == ['data.date', 'data.status', 'location.id']
+        assert isinstance(df['data.status'].dtype, pd.CategoricalDtype)
+        assert df['data.date'].tolist()[0] == pd.Timestamp('1933-01-01')
+        assert pd.isna(df['data.date'].tolist()[1])
+        
+    def test_empty_array(self, tmp_path):
+        path = tmp_path / "empty.json"
+        path.write_text("[ ]")
+        
+        assert len(read_json(str(path))) == 0
+        
+    def test_truncated_array(self, tmp_path):
+        path = tmp_path / "broken.json"
+        path.write_text(json.dumps(RECORDS)[:-20])
+        
+        with pytest.raises(ValueError):
+            read_json(str(path))
+            
+    def test_ndjson_from_offset(self, ndjson_file):
+        with open(ndjson_file, 'rb') as the_file:
+            offset = len(the_file.readline())
+        
+        df = read_json(ndjson_file, offset=offset)
+        
+        assert df['location.id'].tolist() == ['CT0024', 'CT0031']
+        
+    def test_ndjson_stops_at_end(self, ndjson_file):
+        with open(ndjson_file, 'rb') as the_file:
+            first = len(the_file.readline())
+            second = first + len(the_file.readline())
+        
+        df = read_json(ndjson_file, offset=first, end=second)
+        
+        assert df['location.id'].tolist() == ['CT0024']
+        
+    def test_is_json_array(self, ndjson_file, array_file):
+        assert json_reader.is_json_array(array_file)
+        assert not json_reader.is_json_array(ndjson_file)
@@ -2,14 +2,21 @@
 # mock
 
 import pytest
+import numpy as np
 import pandas as pd
 import sys
 import os
+from datetime import datetime
 from unittest.mock import Mock, MagicMock, patch, call
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from load import get_db_connection, create_tables, load_to_staging, load_rejected
+import psycopg2
+from psycopg2.pool import PoolError
+from load import get_db_connection, create_tables, load_to_staging, load_rejected, to_copy_buffer, encode_rows
+from validate import split_by_rules
+from load import ConnectionPool, get_connection_pool, pooled_connection, close_connection_pools
+from load import load_partitioned, partition_frame, with_row_hash, existing_keys
 
 
 # My Fixtures
@@ -35,10 +42,84 @@ def sample_rejected_data():
 def mock_db_connection():
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
+    # Every UPSERT answers with one (inserted, updated) row
+    mock_cursor.fetchone.return_value = (1, 0)
     mock_conn.cursor.return_value = mock_cursor
     return mock_conn, mock_cursor
 
 
+# Testing the connection pool
+def make_pooled_conn(healthy=True):
+    conn = MagicMock()
+    conn.closed = 0
+    conn.autocommit = False
+    if not healthy:
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("server closed the connection")
+    return conn
+
+
+class TestConnectionPool:
+    
+    @pytest.fixture(autouse=True)
+    def reset_pools(self):
+        yield
+        close_connection_pools()
+    
+    @patch('load.ThreadedConnectionPool')
+    def test_checkout_checks_health_and_returns_connection(self, mock_pool_class):
+        conn = make_pooled_conn()
+        mock_pool = mock_pool_class.return_value
+        mock_pool.getconn.return_value = conn
+        
+        with pooled_connection('postgresql://test', min_size=2, max_size=4) as checked_out:
+            assert checked_out is conn
+            checked_out.autocommit = True
+        
+        mock_pool_class.assert_called_once_with(2, 4, 'postgresql://test')
+        conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with("SELECT 1")
+        # Handed back with no open transaction and autocommit reset
+        mock_pool.putconn.assert_called_once_with(conn, close=False)
+        assert conn.autocommit is False
+        conn.close.assert_not_called()
+    
+    @patch('load.ThreadedConnectionPool')
+    def test_broken_connection_is_replaced(self, mock_pool_class):
+        broken, fresh = make_pooled_conn(healthy=False), make_pooled_conn()
+        mock_pool = mock_pool_class.return_value
+        mock_pool.getconn.side_effect = [broken, fresh]
+        
+        with pooled_connection('postgresql://test') as conn:
+            assert conn is fresh
+        
+        assert mock_pool.putconn.call_args_list == [call(broken, close=True), call(fresh, close=False)]
+    
+    @patch('load.ThreadedConnectionPool')
+    def test_pool_is_shared_and_closed(self, mock_pool_class):
+        mock_pool_class.return_value.getconn.return_value = make_pooled_conn()
+        
+        assert get_connection_pool('postgresql://test') is get_connection_pool('postgresql://test')
+        with pooled_connection('postgresql://test'):
+            pass
+        close_connection_pools()
+        
+        mock_pool_class.assert_called_once()
+        mock_pool_class.return_value.closeall.assert_called_once()
+    
+    @patch('load.ThreadedConnectionPool')
+    def test_exhausted_pool_times_out(self, mock_pool_class):
+        mock_pool_class.return_value.getconn.return_value = make_pooled_conn()
+        pool = ConnectionPool('postgresql://test', max_size=1, timeout=0.01)
+        
+        with pool.connection():
+            with pytest.raises(PoolError):
+                with pool.connection():
+                    pass
+        
+        # The slot is free again once the first connection is back
+        with pool.connection():
+            pass
+
+
 # Testing my get_db_connection
 
 class TestGetDbConnetion:
@@ -178,6 +259,291 @@ class TestLoadToStaging:
         assert  'DO UPDATE SET' in sql_query
         
 
+class TestCopyToStaging:
+    
+    def test_copy_method_streams_each_batch(self, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        
+        rows_loaded = load_to_staging(
+            mock_conn,
+            sample_valid_data,
+            table_name='stg_test',
+            pk_column='location_id',
+            batch_size=2,
+            method='copy'
+        )
+        
+        assert rows_loaded == 3
+        assert mock_cursor.copy_expert.call_count == 2
+        assert mock_conn.commit.call_count == 2
+        
+        copy_sql = mock_cursor.copy_expert.call_args_list[0][0][0]
+        assert copy_sql.startswith('COPY tmp_stg_test (location_id, city, parking_spaces, state, row_hash)')
+        
+        merge_sql = mock_cursor.execute.call_args_list[-1][0][0]
+        assert 'INSERT INTO stg_test' in merge_sql
+        assert 'SELECT location_id, city, parking_spaces, state, row_hash FROM tmp_stg_test' in merge_sql
+        assert 'ON CONFLICT (location_id) DO UPDATE SET' in merge_sql
+        
+    def test_copy_keeps_last_duplicate(self, mock_db_connection):
+        mock_conn, mock_cursor = mock_db_connection
+        
+        df = pd.DataFrame({
+            'location_id': ['CT001', 'CT001'],
+            'city': ['Old', 'New']
+        })
+        
+        rows_loaded = load_to_staging(mock_conn, df, 'stg_test', 'location_id', method='copy')
+        
+        assert rows_loaded == 1
+        buffer = mock_cursor.copy_expert.call_args_list[0][0][1]
+        assert buffer.getvalue().startswith('CT001\tNew\t')
+        assert buffer.getvalue().count('\n') == 1
+        
+    def test_copy_rollback_on_error(self, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        mock_cursor.copy_expert.side_effect = Exception("COPY failed")
+        
+        with pytest.raises(Exception):
+            load_to_staging(mock_conn, sample_valid_data, 'stg_test', 'location_id', method='copy')
+        
+        mock_conn.rollback.assert_called_once()
+        mock_cursor.close.assert_called_once()
+        
+    def test_unknown_method(self, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        
+        with pytest.raises(ValueError):
+            load_to_staging(mock_conn, sample_valid_data, 'stg_test', 'location_id', method='bogus')
+
+
+class TestRowHash:
+    
+    def test_hash_ignores_dtype_and_tracks_content(self):
+        plain = pd.DataFrame({'location_id': ['CT001', 'CT002'], 'parking_spaces': [10.0, None]})
+        typed = pd.DataFrame({
+            'location_id': pd.array(['CT001', 'CT002'], dtype='string[pyarrow]'),
+            'parking_spaces': pd.array([10, None], dtype='Int32')
+        })
+        changed = plain.assign(parking_spaces=[11.0, None])
+        
+        hashes = with_row_hash(plain)['row_hash'].tolist()
+        
+        assert hashes == with_row_hash(typed)['row_hash'].tolist()
+        assert hashes[0] != with_row_hash(changed)['row_hash'].iloc[0]
+        assert hashes[1] == with_row_hash(changed)['row_hash'].iloc[1]
+    
+    def test_upsert_skips_unchanged_rows(self, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        
+        load_to_staging(mock_conn, sample_valid_data, 'stg_test', 'location_id')
+        
+        sql_query, values = mock_cursor.execute.call_args_list[0][0]
+        assert 'row_hash' in sql_query.split('VALUES')[0]
+        assert 'WHERE stg_test.row_hash IS DISTINCT FROM EXCLUDED.row_hash' in sql_query
+        assert 'RETURNING (xmax = 0) AS inserted' in sql_query
+        assert values[-1] == with_row_hash(sample_valid_data)['row_hash'].iloc[0]
+    
+    def test_counts_are_reported(self, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        # First batch: 1 inserted + 1 updated, second batch: 0 + 0 (unchanged)
+        mock_cursor.fetchone.side_effect = [(1, 1), (0, 0)]
+        stats = {'inserted': 5}
+        
+        load_to_staging(mock_conn, sample_valid_data, 'stg_test', 'location_id',
+                        batch_size=2, method='copy', stats=stats)
+        
+        assert stats == {'inserted': 6, 'updated': 1, 'unchanged': 1}
+    
+    @patch('load.execute_values')
+    def test_values_counts_every_page(self, mock_execute_values, mock_db_connection, sample_valid_data):
+        mock_conn, _ = mock_db_connection
+        mock_execute_values.return_value = [(1, 0), (0, 1)]
+        stats = {}
+        
+        load_to_staging(mock_conn, sample_valid_data, 'stg_test', 'location_id',
+                        method='values', page_size=2, stats=stats)
+        
+        assert mock_execute_values.call_args[1]['fetch'] is True
+        assert stats == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+
+
+class TestValuesToStaging:
+    
+    @patch('load.execute_values')
+    def test_values_method_sends_one_statement_per_batch(self, mock_execute_values, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        
+        rows_loaded = load_to_staging(
+            mock_conn,
+            sample_valid_data,
+            table_name='stg_real_estate',
+            pk_column='location_id',
+            batch_size=2,
+            method='values'
+        )
+        
+        assert rows_loaded == 3
+        assert mock_execute_values.call_count == 2
+        assert mock_conn.commit.call_count == 2
+        mock_cursor.execute.assert_not_called()
+        
+        cursor, query, rows = mock_execute_values.call_args_list[0][0]
+        assert cursor == mock_cursor
+        assert 'VALUES %s' in query
+        assert 'ON CONFLICT (location_id) DO UPDATE SET' in query
+        assert [row[:-1] for row in rows] == [('CT001', 'Hartford', 10, 'CT'), ('CT002', 'New Haven', 0, 'CT')]
+        # page_size falls back to batch_size: one statement per batch
+        assert mock_execute_values.call_args_list[0][1]['page_size'] == 2
+    
+    @patch('load.execute_values')
+    def test_values_keeps_last_duplicate_and_page_size(self, mock_execute_values, mock_db_connection):
+        mock_conn, _ = mock_db_connection
+        df = pd.DataFrame({'location_id': ['A', 'A', 'B'], 'city': ['old', 'new', None]})
+        
+        rows_loaded = load_to_staging(mock_conn, df, 'stg_real_estate', 'location_id',
+                                      batch_size=1000, method='values', page_size=100)
+        
+        assert rows_loaded == 2
+        rows = mock_execute_values.call_args[0][2]
+        assert [row[:-1] for row in rows] == [('A', 'new'), ('B', None)]
+        assert mock_execute_values.call_args[1]['page_size'] == 100
+    
+    @patch('load.execute_values')
+    def test_values_rollback_on_error(self, mock_execute_values, mock_db_connection, sample_valid_data):
+        mock_conn, mock_cursor = mock_db_connection
+        mock_execute_values.side_effect = Exception("Insert failed")
+        
+        with pytest.raises(Exception):
+            load_to_staging(mock_conn, sample_valid_data, 'stg_real_estate', 'location_id', method='values')
+        
+        mock_conn.rollback.assert_called_once()
+        mock_cursor.close.assert_called_once()
+
+
+class TestEncodeRows:
+    
+    def test_missing_values_become_none(self):
+        df = pd.DataFrame({
+            'region_id': pd.array([3, None], dtype='Int32'),
+            'data_date': pd.to_datetime(['2020-01-01', None]),
+            'state': pd.Categorical(['CT', None]),
+            'city': [float('nan'), 'Hartford'],
+            'ansi_usable': pd.array(['Yes', None], dtype='string[pyarrow]')
+        })
+        
+        rows = encode_rows(df)
+        
+        assert rows[0] == (3, datetime(2020, 1, 1), 'CT', None, 'Yes')
+        assert rows[1] == (None, None, None, 'Hartford', None)
+    
+    def test_values_are_native_python_types(self):
+        df = pd.DataFrame({
+            'parking_spaces': np.array([10, 0], dtype='int64'),
+            'ratio': [0.5, 1.5],
+            'flag': [True, False],
+            'region_id': pd.array([1, None], dtype='int16[pyarrow]'),
+            'data_date': pd.to_datetime(['2020-01-01', '2021-06-30'])
+        })
+        
+        rows = encode_rows(df)
+        
+        assert [type(value) for value in rows[0]] == [int, float, bool, int, datetime]
+        assert rows[1] == (0, 1.5, False, None, datetime(2021, 6, 30))
+    
+    def test_integral_float_column_with_nan_is_sent_as_int(self):
+        rows = encode_rows(pd.DataFrame({'parking_spaces': [10.0, None]}))
+        
+        assert rows == [(10,), (None,)]
+        assert type(rows[0][0]) is int
+
+
+class TestLoadPartitioned:
+    
+    @pytest.fixture
+    def many_rows(self):
+        return pd.DataFrame({
+            'location_id': [f"CT{i:04d}" for i in range(100)],
+            'city': ['Hartford'] * 100
+        })
+    
+    def test_partitions_are_disjoint_and_complete(self, many_rows):
+        duplicated = pd.concat([many_rows, many_rows.iloc[:10]])
+        
+        shards = partition_frame(duplicated, 'location_id', 4)
+        
+        assert len(shards) == 4
+        assert sum(len(shard) for shard in shards) == len(duplicated)
+        keys = [set(shard['location_id']) for shard in shards]
+        for i in range(4):
+            for j in range(i + 1, 4):
+                assert not keys[i] & keys[j]
+    
+    @patch('load.load_to_staging')
+    @patch('load.pooled_connection')
+    def test_each_shard_loads_over_its_own_connection(self, mock_pooled_connection, mock_load_to_staging, many_rows):
+        loaded = []
+        def fake_load(conn, df, table_name, pk_column, **kwargs):
+            loaded.append((conn, set(df[pk_column]), kwargs))
+            return len(df)
+        mock_load_to_staging.side_effect = fake_load
+        
+        total = load_partitioned('postgresql://test', many_rows, 'stg_real_estate', 'location_id',
+                                 workers=4, pool={'max_size': 8}, batch_size=10, method='copy')
+        
+        assert total == 100
+        assert mock_pooled_connection.call_count == 4
+        mock_pooled_connection.assert_called_with('postgresql://test', max_size=8)
+        assert set().union(*[keys for _, keys, _ in loaded]) == set(many_rows['location_id'])
+        assert all(kwargs['method'] == 'copy' and kwargs['batch_size'] == 10 for _, _, kwargs in loaded)
+    
+    @patch('load.load_to_staging')
+    @patch('load.pooled_connection')
+    def test_small_frames_use_one_shard(self, mock_pooled_connection, mock_load_to_staging, sample_valid_data):
+        mock_load_to_staging.side_effect = lambda conn, df, *args, **kwargs: len(df)
+        
+        total = load_partitioned('postgresql://test', sample_valid_data, 'stg_real_estate', 'location_id',
+                                 workers=4, batch_size=1000)
+        
+        assert total == 3
+        mock_pooled_connection.assert_called_once()
+    
+    @patch('load.load_to_staging')
+    @patch('load.pooled_connection')
+    def test_failed_shard_raises_after_others_finish(self, mock_pooled_connection, mock_load_to_staging, many_rows):
+        calls = []
+        def fake_load(conn, df, *args, **kwargs):
+            calls.append(len(df))
+            if len(calls) == 1:
+                raise Exception("Shard failed")
+            return len(df)
+        mock_load_to_staging.side_effect = fake_load
+        
+        with pytest.raises(Exception, match="Shard failed"):
+            load_partitioned('postgresql://test', many_rows, 'stg_real_estate', 'location_id',
+                             workers=4, batch_size=10)
+        
+        assert len(calls) == 4
+
+
+class TestToCopyBuffer:
+    
+    def test_nulls_and_special_characters(self):
+        df = pd.DataFrame({
+            'location_id': ['CT001', 'CT002'],
+            'address_line1': ['1 Main\tSt', None],
+            'parking_spaces': [10, None],
+            'data_date': pd.to_datetime(['1933-01-01', None])
+        })
+        
+        text = to_copy_buffer(df).getvalue()
+        
+        assert text == (
+            'CT001\t1 Main\\tSt\t10\t1933-01-01\n'
+            'CT002\t\\N\t\\N\t\\N\n'
+        )
+
+
 # Test load_rejected
 class TestLoadRejected:
     
@@ -229,6 +595,88 @@ class TestLoadRejected:
         assert 'rejection_reason' in sql_query
         
 
+    @patch('load.execute_values')
+    def test_load_rejected_values_method(self, mock_execute_values, mock_db_connection):
+        mock_conn, mock_cursor = mock_db_connection
+        rejected = pd.DataFrame({
+            'location_id': ['CT997', 'CT998', 'CT999'],
+            'rejection_reason': ['Missing city'] * 3
+        })
+        
+        rows_loaded = load_rejected(mock_conn, rejected, 'test_source', method='values', page_size=2)
+        
+        assert rows_loaded == 3
+        # Rejects are materialised and sent one page at a time
+        assert mock_execute_values.call_count == 2
+        mock_cursor.execute.assert_not_called()
+        _, query, rows = mock_execute_values.call_args_list[0][0]
+        assert 'INSERT INTO stg_rejects' in query and 'VALUES %s' in query
+        assert rows[0] == ('test_source', '{"location_id":"CT997"}', 'Missing city')
+        assert mock_execute_values.call_args[1]['page_size'] == 2
+        mock_conn.commit.assert_called_once()
+        
+    def test_load_rejected_copy_method_pages_by_position(self, mock_db_connection):
+        mock_conn, mock_cursor = mock_db_connection
+        rejected = pd.DataFrame({
+            'location_id': ['CT995', 'CT997', 'CT999'],
+            'rejection_reason': ['Missing location_id', 'Missing or empty city', 'Negative parking_spaces']
+        }, index=[5, 7, 9])
+        
+        rows_loaded = load_rejected(mock_conn, rejected, 'test_source', method='copy', page_size=2)
+        
+        assert rows_loaded == 3
+        assert mock_cursor.copy_expert.call_count == 2
+        lines = [line for call in mock_cursor.copy_expert.call_args_list
+                 for line in call[0][1].getvalue().splitlines()]
+        assert lines == [
+            'test_source\t{"location_id":"CT995"}\tMissing location_id',
+            'test_source\t{"location_id":"CT997"}\tMissing or empty city',
+            'test_source\t{"location_id":"CT999"}\tNegative parking_spaces'
+        ]
+        
+    def test_load_rejected_from_reject_set(self, mock_db_connection):
+        mock_conn, mock_cursor = mock_db_connection
+        df = pd.DataFrame({'location_id': ['CT001', None, 'CT003'], 'city': ['Hartford', 'Stamford', None]})
+        _, rejected = split_by_rules(df, [('Missing or empty city', df['city'].isna()),
+                                          ('Missing location_id', df['location_id'].isna())])
+        
+        rows_loaded = load_rejected(mock_conn, rejected, 'test_source')
+        
+        assert rows_loaded == 2
+        values = [call[0][1] for call in mock_cursor.execute.call_args_list]
+        assert values == [
+            ('test_source', '{"location_id":"CT003","city":null}', 'Missing or empty city'),
+            ('test_source', '{"location_id":null,"city":"Stamford"}', 'Missing location_id')
+        ]
+        
+    def test_load_rejected_copy_method(self, mock_db_connection):
+        mock_conn, mock_cursor = mock_db_connection
+        rejected = pd.DataFrame({
+            'location_id': ['CT998', 'CT999'],
+            'data_date': pd.to_datetime(['2024-03-01', None]),
+            'parking_spaces': [4.0, np.nan],
+            'address_line1': ['1 Main St\\Rear', 'Unit\t2'],
+            'rejection_reason': ['NULL value in zip_code', 'NULL value in data_date']
+        })
+        
+        rows_loaded = load_rejected(mock_conn, rejected, 'test_source', method='copy', page_size=1000)
+        
+        assert rows_loaded == 2
+        mock_cursor.execute.assert_not_called()
+        mock_cursor.copy_expert.assert_called_once()
+        query, buffer = mock_cursor.copy_expert.call_args[0]
+        assert query == "COPY stg_rejects (source_name, raw_data, rejection_reason) FROM STDIN"
+        # One COPY line per reject; JSON backslash escapes are doubled for the COPY text format
+        assert buffer.getvalue().split('\n') == [
+            'test_source\t{"location_id":"CT998","data_date":"2024-03-01T00:00:00","parking_spaces":4,'
+            '"address_line1":"1 Main St\\\\\\\\Rear"}\tNULL value in zip_code',
+            'test_source\t{"location_id":"CT999","data_date":null,"parking_spaces":null,'
+            '"address_line1":"Unit\\\\t2"}\tNULL value in data_date',
+            ''
+        ]
+        mock_conn.commit.assert_called_once()
+        
+
 # Integration test
 class TestDatabaseIntegration:
     def test_full_loaded_workflow(slef, mock_db_connection, sample_valid_data):
@@ -290,4 +738,24 @@ class TestErrorHandling:
             cursor.close.assert_called()
             
         
-    
\ No newline at end of file
+    
+
+
+class TestExistingKeys:
+    
+    def test_looks_up_distinct_keys_in_one_query(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [('CT001',)]
+        df = pd.DataFrame({'location_id': ['CT001', 'CT003', 'CT001', None]})
+        
+        assert existing_keys(conn, df, 'stg_real_estate', 'location_id') == {'CT001'}
+        query, params = cursor.execute.call_args[0]
+        assert 'FROM stg_real_estate WHERE location_id = ANY(%s)' in query
+        assert params == (['CT001', 'CT003'],)
+        
+    def test_no_keys_no_query(self):
+        conn = MagicMock()
+        
+        assert existing_keys(conn, pd.DataFrame({'location_id': []}), 'stg_real_estate', 'location_id') == set()
+        conn.cursor.assert_not_called()
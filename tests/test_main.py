@@ -11,24 +11,18 @@ class TestRunPipiLines:
     @patch('main.load_rejected')
     @patch('main.load_to_staging')
     @patch('main.create_tables')
-    @patch('main.get_db_connection')
+    @patch('main.pooled_connection')
     @patch('main.apply_all_validations')
-    @patch('main.convert_date_format')
-    @patch('main.handle_missing_values')
-    @patch('main.strip_whitespace')
-    @patch('main.rename_columns')
+    @patch('main.compile_clean_plan')
     @patch('main.read_csv')
     @patch('main.load_config')
     def test_successful_pipeline_execution(
         self,
         mock_load_config,
         mock_read_csv,
-        mock_rename_columns,
-        mock_strip_whitespace,
-        mock_handle_missing_values,
-        mock_convert_date_format,
+        mock_compile_clean_plan,
         mock_apply_all_validations,
-        mock_get_db_connection,
+        mock_pooled_connection,
         mock_create_tables,
         mock_load_to_staging,
         mock_load_rejected
@@ -63,14 +57,11 @@ class TestRunPipiLines:
         })
 
         mock_read_csv.return_value = test_df
-        mock_rename_columns.return_value = test_df
-        mock_strip_whitespace.return_value = test_df
-        mock_handle_missing_values.return_value = test_df
-        mock_convert_date_format.return_value = test_df
+        mock_compile_clean_plan.return_value.apply.return_value = test_df
         mock_apply_all_validations.return_value = (valid_df, rejected_df)
 
         mock_conn = Mock()
-        mock_get_db_connection.return_value = mock_conn
+        mock_pooled_connection.return_value.__enter__.return_value = mock_conn
         mock_load_to_staging.return_value = 2
         mock_load_rejected.return_value = 1
 
@@ -79,16 +70,16 @@ class TestRunPipiLines:
 
         mock_load_config.assert_called_once_with('config/sources.json')
         mock_read_csv.assert_called_once_with('test.csv')
-        mock_rename_columns.assert_called_once()
-        mock_strip_whitespace.assert_called_once()
-        mock_handle_missing_values.assert_called_once()
-        mock_convert_date_format.assert_called_once()
+        mock_compile_clean_plan.assert_called_once()
+        mock_compile_clean_plan.return_value.apply.assert_called_once_with(test_df)
         mock_apply_all_validations.assert_called_once()
-        mock_get_db_connection.assert_called_once()
+        mock_pooled_connection.assert_called_once()
         mock_create_tables.assert_called_once_with(mock_conn)
         mock_load_to_staging.assert_called_once()
         mock_load_rejected.assert_called_once()
-        mock_conn.close.assert_called_once()
+        # The connection goes back to the pool instead of being closed
+        mock_pooled_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
 
         assert valid_count == 2
         assert rejected_count == 1
@@ -103,24 +94,18 @@ class TestRunPipiLines:
 
         assert exc_info.value.code == 1
 
-    @patch('main.get_db_connection')
+    @patch('main.pooled_connection')
     @patch('main.apply_all_validations')
-    @patch('main.convert_date_format')
-    @patch('main.handle_missing_values')
-    @patch('main.strip_whitespace')
-    @patch('main.rename_columns')
+    @patch('main.compile_clean_plan')
     @patch('main.read_csv')
     @patch('main.load_config')
     def test_pipeline_failure_on_database_connection(
         self,
         mock_load_config,
         mock_read_csv,
-        mock_renamea_columns,
-        mock_strip_whitespace,
-        mock_handle_missing_values,
-        mock_convert_date_format,
+        mock_compile_clean_plan,
         mock_apply_all_validation,
-        mock_get_db_connection
+        mock_pooled_connection
     ):
 
         mock_load_config.return_value = {
@@ -137,13 +122,10 @@ class TestRunPipiLines:
         
         test_df = pd.DataFrame({'id': ['1']})
         mock_read_csv.return_value = test_df
-        mock_renamea_columns.return_value = test_df
-        mock_strip_whitespace.return_value = test_df
-        mock_handle_missing_values.return_value = test_df
-        mock_convert_date_format.return_value = test_df
+        mock_compile_clean_plan.return_value.apply.return_value = test_df
         mock_apply_all_validation.return_value = (test_df, pd.DataFrame())
         
-        mock_get_db_connection.side_effect = Exception("Connection failed")
+        mock_pooled_connection.side_effect = Exception("Connection failed")
         
         from main import run_pipeline
         with pytest.raises(SystemExit):
@@ -152,24 +134,18 @@ class TestRunPipiLines:
     @patch('main.load_rejected')
     @patch('main.load_to_staging')
     @patch('main.create_tables')
-    @patch('main.get_db_connection')
+    @patch('main.pooled_connection')
     @patch('main.apply_all_validations')
-    @patch('main.convert_date_format')
-    @patch('main.handle_missing_values')
-    @patch('main.strip_whitespace')
-    @patch('main.rename_columns')
+    @patch('main.compile_clean_plan')
     @patch('main.read_csv')
     @patch('main.load_config')
     def test_database_connection_closed_on_success(
         self,
         mock_load_config,
         mock_read_csv,
-        mock_rename_columns,
-        mock_strip_whitespace,
-        mock_handle_missing_values,
-        mock_convert_date_format,
+        mock_compile_clean_plan,
         mock_apply_all_validations,
-        mock_get_db_connection,
+        mock_pooled_connection,
         mock_create_tables,
         mock_load_to_staging,
         mock_load_rejected
@@ -181,29 +157,315 @@ class TestRunPipiLines:
         
         test_df = pd.DataFrame({'id': ['1']})
         mock_read_csv.return_value = test_df
-        mock_rename_columns.return_value = test_df
-        mock_strip_whitespace.return_value = test_df
-        mock_handle_missing_values.return_value = test_df
-        mock_convert_date_format.return_value = test_df
+        mock_compile_clean_plan.return_value.apply.return_value = test_df
         mock_apply_all_validations.return_value = (test_df, pd.DataFrame())
         
         mock_conn = Mock()
-        mock_get_db_connection.return_value = mock_conn
+        mock_pooled_connection.return_value.__enter__.return_value = mock_conn
         mock_load_to_staging.return_value = 1
         mock_load_rejected.return_value = 0
         
         from main import run_pipeline
         run_pipeline()
         
-        mock_conn.close.assert_called_once()
-        
-    
-    
-    
-    
-    
-    
-    
-        
-        
-    
\ No newline at end of file
+        # The connection goes back to the pool instead of being closed
+        mock_pooled_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
+
+
+class TestRunStreaming:
+
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    @patch('main.read_csv')
+    @patch('main.load_config')
+    def test_chunks_flow_through_every_stage(
+        self,
+        mock_load_config,
+        mock_read_csv,
+        mock_pooled_connection,
+        mock_create_tables,
+        mock_load_to_staging,
+        mock_load_rejected
+    ):
+        mock_load_config.return_value = {
+            'sources': [{'name': 'test', 'path': 'test.csv', 'target_table': 'test'}],
+            'defaults': {'db_url': 'test', 'batch_size': 100, 'chunk_size': 2}
+        }
+
+        chunk_1 = pd.DataFrame({
+            'location.id': ['LOC001', 'LOC002'],
+            'location.address.city': ['Hartford', 'Boston'],
+            'location.address.state': ['CT', 'MA'],
+            'data.parking spaces': [1, 2]
+        })
+        chunk_2 = pd.DataFrame({
+            'location.id': ['LOC001', None],
+            'location.address.city': ['Hartford', 'Boston'],
+            'location.address.state': ['CT', 'MA'],
+            'data.parking spaces': [1, 2]
+        }, index=[2, 3])
+        mock_read_csv.return_value = iter([chunk_1, chunk_2])
+
+        mock_conn = Mock()
+        mock_pooled_connection.return_value.__enter__.return_value = mock_conn
+        mock_load_to_staging.side_effect = lambda conn, df, **kwargs: len(df)
+        mock_load_rejected.side_effect = lambda conn, df, **kwargs: len(df)
+
+        from main import run_pipeline
+        valid_count, rejected_count = run_pipeline()
+
+        mock_read_csv.assert_called_once_with('test.csv', chunksize=2)
+        mock_create_tables.assert_called_once_with(mock_conn)
+        assert mock_load_to_staging.call_count == 2
+        # The connection goes back to the pool instead of being closed
+        mock_pooled_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
+
+        # LOC001 in the second chunk is a duplicate of the first chunk
+        assert valid_count == 2
+        assert rejected_count == 1
+
+
+class TestRunAllSources:
+
+    def make_config(self, max_workers):
+        return {
+            'sources': [
+                {'name': 'east', 'path': 'east.csv', 'target_table': 'test'},
+                {'name': 'west', 'path': 'west.csv', 'target_table': 'test'}
+            ],
+            'defaults': {'db_url': 'test', 'batch_size': 100, 'max_workers': max_workers}
+        }
+
+    @patch('main.run_source')
+    @patch('main.load_config')
+    def test_every_source_runs(self, mock_load_config, mock_run_source):
+        mock_load_config.return_value = self.make_config(max_workers=1)
+        mock_run_source.side_effect = lambda source_config, defaults: {
+            'source': source_config['name'], 'status': 'ok', 'rows': 3,
+            'valid': 2, 'rejected': 1, 'seconds': 0.1, 'error': None
+        }
+
+        from main import run_pipeline
+        valid_count, rejected_count = run_pipeline()
+
+        assert [c[0][0]['name'] for c in mock_run_source.call_args_list] == ['east', 'west']
+        assert valid_count == 4
+        assert rejected_count == 2
+
+    @patch('main.run_source')
+    @patch('main.load_config')
+    def test_failed_source_does_not_stop_others(self, mock_load_config, mock_run_source):
+        mock_load_config.return_value = self.make_config(max_workers=1)
+
+        def fake_run_source(source_config, defaults):
+            if source_config['name'] == 'east':
+                raise Exception("bad file")
+            return {'source': 'west', 'status': 'ok', 'rows': 1,
+                    'valid': 1, 'rejected': 0, 'seconds': 0.1, 'error': None}
+        mock_run_source.side_effect = fake_run_source
+
+        from main import run_pipeline
+        with pytest.raises(SystemExit):
+            run_pipeline()
+
+        assert mock_run_source.call_count == 2
+
+    @patch('main.ProcessPoolExecutor')
+    @patch('main.run_source')
+    def test_sources_use_worker_pool(self, mock_run_source, mock_pool):
+        from concurrent.futures import ThreadPoolExecutor
+        mock_pool.side_effect = ThreadPoolExecutor
+        mock_run_source.side_effect = lambda source_config, defaults: {
+            'source': source_config['name'], 'status': 'ok', 'rows': 1,
+            'valid': 1, 'rejected': 0, 'seconds': 0.1, 'error': None
+        }
+
+        from main import run_all_sources
+        config = self.make_config(max_workers=4)
+        results = run_all_sources(config['sources'], config['defaults'], max_workers=4)
+
+        mock_pool.assert_called_once_with(max_workers=2)
+        assert [result['source'] for result in results] == ['east', 'west']
+
+
+class TestLoadValid:
+
+    @patch('main.load_to_staging')
+    @patch('main.load_partitioned')
+    def test_load_workers_switch_to_partitioned_load(self, mock_load_partitioned, mock_load_to_staging):
+        from main import load_valid
+        source_config = {'name': 'test', 'target_table': 'stg_real_estate'}
+        defaults = {'db_url': 'test', 'batch_size': 100, 'load_workers': 3, 'pool': {'max_size': 5}}
+        df = pd.DataFrame({'location_id': ['A', 'B']})
+        mock_load_partitioned.return_value = 2
+
+        assert load_valid(Mock(), df, source_config, defaults, 'location_id') == 2
+
+        mock_load_to_staging.assert_not_called()
+        kwargs = mock_load_partitioned.call_args[1]
+        assert kwargs['workers'] == 3
+        assert kwargs['pool']['max_size'] == 5
+        assert kwargs['batch_size'] == 100
+
+
+class TestIncrementalSources:
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "feed.csv"
+        path.write_text(
+            '"location.id","location.address.city","location.address.state"\n'
+            '"CT001","HARTFORD","CT"\n'
+            '"CT002","NEW HAVEN","CT"\n'
+        )
+        source_config = {'name': 'feed', 'path': str(path), 'target_table': 'test'}
+        defaults = {'db_url': 'test', 'batch_size': 100, 'manifest_path': str(tmp_path / "manifest.json")}
+        return path, source_config, defaults
+
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    def test_skip_then_tail(self, mock_pooled_connection, mock_create_tables,
+                            mock_load_to_staging, mock_load_rejected, source):
+        from main import run_source
+        path, source_config, defaults = source
+        loaded = []
+        mock_load_to_staging.side_effect = lambda conn, df, **kwargs: loaded.append(df['location_id'].tolist()) or len(df)
+        mock_load_rejected.return_value = 0
+
+        first = run_source(source_config, defaults)
+        second = run_source(source_config, defaults)
+        with open(path, 'a') as the_file:
+            the_file.write('"CT003","BRIDGEPORT","CT"\n')
+        third = run_source(source_config, defaults)
+
+        assert [result['status'] for result in (first, second, third)] == ['ok', 'skipped', 'ok']
+        assert loaded == [['CT001', 'CT002'], ['CT003']]
+        assert third['rows'] == 1
+
+    @pytest.mark.parametrize('chunk_size', [None, 10])
+    @patch('main.existing_keys')
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    def test_tail_keeps_first_row_per_key(self, mock_pooled_connection, mock_create_tables, mock_load_to_staging,
+                                          mock_load_rejected, mock_existing_keys, chunk_size, source):
+        from main import run_source
+        path, source_config, defaults = source
+        defaults['chunk_size'] = chunk_size
+        loaded = []
+        mock_load_to_staging.side_effect = lambda conn, df, **kwargs: loaded.append(df['location_id'].tolist()) or len(df)
+        mock_load_rejected.return_value = 0
+        mock_existing_keys.side_effect = lambda conn, df, table, pk: {'CT001', 'CT002'} & set(df[pk])
+
+        run_source(source_config, defaults)
+        with open(path, 'a') as the_file:
+            the_file.write('"CT001","STAMFORD","CT"\n"CT003","BRIDGEPORT","CT"\n')
+        run_source(source_config, defaults)
+
+        # Same result as a full load of the whole file: CT001 keeps its first (HARTFORD) row
+        assert loaded == [['CT001', 'CT002'], ['CT003']]
+        # The first, full load does not look up existing keys
+        assert mock_existing_keys.call_count == 1
+
+    @pytest.mark.parametrize('chunk_size', [None, 10])
+    @patch('main.existing_keys')
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    def test_half_written_line_waits_for_next_run(self, mock_pooled_connection, mock_create_tables, mock_load_to_staging,
+                                                  mock_load_rejected, mock_existing_keys, chunk_size, source):
+        from main import run_source
+        path, source_config, defaults = source
+        defaults['chunk_size'] = chunk_size
+        loaded = []
+        mock_load_to_staging.side_effect = lambda conn, df, **kwargs: loaded.append(df['city'].tolist()) or len(df)
+        mock_load_rejected.return_value = 0
+        mock_existing_keys.return_value = set()
+
+        # A writer has flushed only part of the third row
+        with open(path, 'a') as the_file:
+            the_file.write('"CT003","BRIDGE')
+        first = run_source(source_config, defaults)
+        with open(path, 'a') as the_file:
+            the_file.write('PORT","CT"\n')
+        second = run_source(source_config, defaults)
+
+        assert loaded == [['HARTFORD', 'NEW HAVEN'], ['BRIDGEPORT']]
+        assert (first['rows'], second['rows']) == (2, 1)
+
+    @patch('main.existing_keys')
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    def test_shared_table_reloads_instead_of_tailing(self, mock_pooled_connection, mock_create_tables,
+                                                     mock_load_to_staging, mock_load_rejected, mock_existing_keys, source):
+        from main import run_source, disable_shared_tails
+        path, source_config, defaults = source
+        other = {'name': 'other', 'type': 'api', 'url': 'http://example.com', 'target_table': 'test'}
+        source_config, _ = disable_shared_tails([source_config, other])
+        loaded = []
+        mock_load_to_staging.side_effect = lambda conn, df, **kwargs: loaded.append(df['location_id'].tolist()) or len(df)
+        mock_load_rejected.return_value = 0
+
+        run_source(source_config, defaults)
+        with open(path, 'a') as the_file:
+            the_file.write('"CT003","BRIDGEPORT","CT"\n')
+        run_source(source_config, defaults)
+
+        assert source_config['tail'] is False
+        assert loaded == [['CT001', 'CT002'], ['CT001', 'CT002', 'CT003']]
+        mock_existing_keys.assert_not_called()
+
+    def test_only_shared_tables_lose_tailing(self):
+        from main import disable_shared_tails
+        sources = [{'name': 'a', 'target_table': 't1'}, {'name': 'b', 'target_table': 't1'},
+                   {'name': 'c', 'target_table': 't2'}]
+
+        checked = disable_shared_tails(sources)
+
+        assert [source.get('tail', True) for source in checked] == [False, False, True]
+        # The configured dicts are left as they were
+        assert 'tail' not in sources[0]
+
+    @patch('main.load_rejected')
+    @patch('main.load_to_staging')
+    @patch('main.create_tables')
+    @patch('main.pooled_connection')
+    def test_failed_load_is_not_recorded(self, mock_pooled_connection, mock_create_tables,
+                                         mock_load_to_staging, mock_load_rejected, source):
+        from main import run_source
+        from manifest import load_manifest
+        _, source_config, defaults = source
+        mock_load_to_staging.side_effect = Exception("Database went away")
+
+        with pytest.raises(Exception):
+            run_source(source_config, defaults)
+
+        assert load_manifest(defaults['manifest_path']) == {}
+
+
+class TestExtract:
+
+    @patch('main.read_json')
+    def test_json_sources_use_json_reader(self, mock_read_json):
+        from main import extract
+        source_config = {'name': 'feed', 'type': 'json', 'path': 'feed.json', 'engine': 'pyarrow'}
+
+        extract(source_config, chunk_size=500)
+
+        mock_read_json.assert_called_once_with('feed.json', chunksize=500)
+
+    def test_unknown_source_type(self):
+        from main import extract
+
+        with pytest.raises(ValueError):
+            extract({'name': 'feed', 'type': 'xml', 'path': 'feed.xml'})
@@ -0,0 +1,100 @@
+import pytest
+import json
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import metrics
+from metrics import stage, timed, timed_chunks
+
+
+@pytest.fixture
+def report():
+    report = metrics.start_run()
+    yield report
+    metrics.finish_run()
+
+
+class TestStage:
+    
+    def test_records_timings(self, report):
+        with stage('clean.test', rows=1000):
+            sum(range(10000))
+        
+        record = report.stages[0]
+        assert record['stage'] == 'clean.test'
+        assert record['rows'] == 1000
+        assert record['wall_seconds'] >= 0
+        assert record['cpu_seconds'] >= 0
+        assert record['peak_rss_mb'] > 0
+        assert 'tracemalloc_mb' not in record
+        
+    def test_rows_filled_in_later(self, report):
+        with stage('extract') as record:
+            record['rows'] = 5
+        
+        assert report.stages[0]['rows'] == 5
+        
+    def test_recorded_when_stage_fails(self, report):
+        with pytest.raises(ValueError):
+            with stage('load.batch'):
+                raise ValueError("boom")
+        
+        assert report.stages[0]['stage'] == 'load.batch'
+        
+    def test_trace_memory(self, report):
+        metrics.enable_trace_memory()
+        
+        with stage('allocate'):
+            data = [0] * 1_000_000
+        
+        assert report.stages[0]['tracemalloc_mb'] > 5
+        
+    def test_no_active_report(self):
+        with stage('ignored'):
+            pass
+        
+    def test_labels(self, report):
+        metrics.set_labels(source='east')
+        with stage('extract'):
+            pass
+        metrics.set_labels()
+        
+        assert report.stages[0]['source'] == 'east'
+
+
+class TestHelpers:
+    
+    def test_timed(self, report):
+        df = pd.DataFrame({'a': [1, 2, 3]})
+        
+        result = timed('clean.double', lambda frame: frame * 2, df)
+        
+        assert result['a'].tolist() == [2, 4, 6]
+        assert report.stages[0]['stage'] == 'clean.double'
+        assert report.stages[0]['rows'] == 3
+        
+    def test_timed_chunks(self, report):
+        chunks = [pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [3]})]
+        
+        result = list(timed_chunks('extract', chunks))
+        
+        assert len(result) == 2
+        assert [record['rows'] for record in report.stages] == [2, 1, 0]
+
+
+class TestRunReport:
+    
+    def test_write_json(self, report, tmp_path):
+        with stage('config'):
+            pass
+        report.extra['sources'] = [{'source': 'east', 'status': 'ok'}]
+        
+        path = report.write(str(tmp_path))
+        
+        with open(path) as the_file:
+            written = json.load(the_file)
+        assert written['run_id'] == report.run_id
+        assert written['sources'][0]['source'] == 'east'
+        assert written['stages'][0]['stage'] == 'config'
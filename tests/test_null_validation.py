@@ -39,8 +39,8 @@ class TestValidateNullValues:
         
         assert len(valid_df) == 1
         assert len(rejected_df) == 1
-        assert rejected_df.iloc[0]['location_id'] == 'LOC002'
-        assert 'ownership_type' in rejected_df.iloc[0]['rejection_reason']
+        assert rejected_df.to_frame().iloc[0]['location_id'] == 'LOC002'
+        assert 'ownership_type' in rejected_df.to_frame().iloc[0]['rejection_reason']
     
     def test_null_property_type(self):
         """Test rejection of NULL property_type"""
@@ -56,8 +56,8 @@ class TestValidateNullValues:
         
         assert len(valid_df) == 1
         assert len(rejected_df) == 1
-        assert rejected_df.iloc[0]['location_id'] == 'LOC001'
-        assert 'property_type' in rejected_df.iloc[0]['rejection_reason']
+        assert rejected_df.to_frame().iloc[0]['location_id'] == 'LOC001'
+        assert 'property_type' in rejected_df.to_frame().iloc[0]['rejection_reason']
     
     def test_null_zip_code(self):
         """Test rejection of NULL zip_code"""
@@ -73,8 +73,8 @@ class TestValidateNullValues:
         
         assert len(valid_df) == 1
         assert len(rejected_df) == 1
-        assert rejected_df.iloc[0]['location_id'] == 'LOC002'
-        assert 'zip_code' in rejected_df.iloc[0]['rejection_reason']
+        assert rejected_df.to_frame().iloc[0]['location_id'] == 'LOC002'
+        assert 'zip_code' in rejected_df.to_frame().iloc[0]['rejection_reason']
     
     def test_null_address_line1(self):
         """Test rejection of NULL address_line1"""
@@ -90,8 +90,8 @@ class TestValidateNullValues:
         
         assert len(valid_df) == 1
         assert len(rejected_df) == 1
-        assert rejected_df.iloc[0]['location_id'] == 'LOC001'
-        assert 'address_line1' in rejected_df.iloc[0]['rejection_reason']
+        assert rejected_df.to_frame().iloc[0]['location_id'] == 'LOC001'
+        assert 'address_line1' in rejected_df.to_frame().iloc[0]['rejection_reason']
     
     def test_multiple_null_values(self):
         """Test rejection of multiple records with NULL values"""
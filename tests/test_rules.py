@@ -47,8 +47,8 @@ class TestApplyAllValidations:
         
         assert len(valid_df) == 2
         assert len(rejected_df) == 1
-        assert rejected_df.iloc[0]['location_id'] == 'LOC002'
-        assert 'parking_spaces' in rejected_df.iloc[0]['rejection_reason'].lower()
+        assert rejected_df.to_frame().iloc[0]['location_id'] == 'LOC002'
+        assert 'parking_spaces' in rejected_df.to_frame().iloc[0]['rejection_reason'].lower()
         
     def test_duplacate_removal(self):
         df = pd.DataFrame({
@@ -96,6 +96,23 @@ class TestApplyAllValidations:
         valid_df, rejected_df = apply_all_validations(df)
         
         assert len(rejected_df) == 2
-        reasons = rejected_df['rejection_reason'].tolist()
+        reasons = rejected_df.to_frame()['rejection_reason'].tolist()
         assert 'location_id' in reasons[0].lower()
-        assert 'parking' in reasons[1].lower()
\ No newline at end of file
+        assert 'parking' in reasons[1].lower()
+
+class TestDeclaredRules:
+    
+    def test_plan_from_source_config(self):
+        from validate import validation_plan
+        df = pd.DataFrame({
+            'location_id': ['LOC001', 'LOC002', 'LOC003'],
+            'state': ['CT', 'Connecticut', None]
+        })
+        plan = validation_plan({'validation': {'rules': [
+            {'column': 'state', 'check': 'length', 'max': 2, 'reason': 'State is not a 2-letter code'}
+        ]}})
+        
+        valid_df, rejected_df = apply_all_validations(df, plan=plan)
+        
+        assert valid_df['location_id'].tolist() == ['LOC001', 'LOC003']
+        assert rejected_df.to_frame()['rejection_reason'].tolist() == ['State is not a 2-letter code']
@@ -0,0 +1,73 @@
+import pytest
+import json
+import logging
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from utils import logger, configure_logging, JsonFormatter, console_handler, file_handler, queue_handler, listener, TEXT_FORMATTER
+from utils import start_logging, stop_logging, is_logging
+
+
+@pytest.fixture
+def restore_logging():
+    yield
+    configure_logging()
+
+
+class TestQueueLogging:
+
+    def test_logger_only_writes_to_the_queue(self):
+        assert logger.handlers == [queue_handler]
+        assert listener.handlers == (file_handler, console_handler)
+        assert is_logging()
+
+    def test_stop_and_restart(self):
+        stop_logging()
+        stop_logging()
+        assert not is_logging()
+
+        start_logging()
+        start_logging()
+        assert is_logging()
+        logger.info("Logging restarted")
+
+
+class TestConfigureLogging:
+
+    def test_levels(self, restore_logging):
+        configure_logging(level='debug', console_level='warning')
+
+        assert logger.level == logging.DEBUG
+        assert console_handler.level == logging.WARNING
+
+    def test_console_follows_level_by_default(self, restore_logging):
+        configure_logging(level='ERROR')
+
+        assert console_handler.level == logging.ERROR
+
+    def test_json_format(self, restore_logging):
+        configure_logging(log_format='json')
+
+        assert isinstance(file_handler.formatter, JsonFormatter)
+        configure_logging(log_format='text')
+        assert file_handler.formatter is TEXT_FORMATTER
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError, match="Unknown log format"):
+            configure_logging(log_format='xml')
+
+
+class TestJsonFormatter:
+
+    def test_record_as_json(self):
+        record = logging.makeLogRecord({'name': 'etl_pipeline', 'levelname': 'INFO', 'msg': "\n Loaded %s rows",
+                                        'args': (42,), 'rows': 42})
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry['level'] == 'INFO'
+        assert entry['logger'] == 'etl_pipeline'
+        assert entry['message'] == 'Loaded 42 rows'
+        # Fields passed with extra={...} are kept
+        assert entry['rows'] == 42
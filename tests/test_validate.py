@@ -1,12 +1,15 @@
 # use pytest for testing
 
+import json
 import pytest
 import pandas as pd
 import sys
 import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-from validate import validate_required_fields, validate_numeric_ranges, remove_duplicates
+from validate import validate_required_fields, validate_numeric_ranges, remove_duplicates, split_by_rules, reason_code, REJECTION_REASONS
+from validate import compile_rules, validation_plan, DEFAULT_PLAN
+import metrics
 
 @pytest.fixture
 def valid_sample_data():
@@ -64,7 +67,7 @@ class TestValidRequiredFields:
         valid, rejected = validate_required_fields(data_with_nulls)
         
         assert len(rejected) >= 1
-        rejected_cities = rejected['city'].tolist()
+        rejected_cities = rejected.to_frame()['city'].tolist()
         assert any(pd.isna(c) or c is None for c in rejected_cities)
         
     def test_empty(self):
@@ -85,7 +88,7 @@ class TestValidRequiredFields:
         
         assert len(valid) == 1
         assert len(rejected) == 2
-        assert 'Missing or empty city' in rejected['rejection_reason'].values
+        assert 'Missing or empty city' in rejected.to_frame()['rejection_reason'].values
         
     def test_empty_string_state(self):
         df = pd.DataFrame({
@@ -98,7 +101,7 @@ class TestValidRequiredFields:
         
         assert len(valid) == 1
         assert len(rejected) == 1
-        assert rejected.iloc[0]['rejection_reason'] == 'Missing or empty state'
+        assert rejected.to_frame().iloc[0]['rejection_reason'] == 'Missing or empty state'
         
         
 class TestValidateNumericRanges:
@@ -115,7 +118,7 @@ class TestValidateNumericRanges:
         
         assert len(valid) == 2
         assert len(rejected) == 1
-        assert rejected.iloc[0]['parking_spaces'] == -5
+        assert rejected.to_frame().iloc[0]['parking_spaces'] == -5
     
     def test_zero_parking_allowed(self, valid_sample_data):
         valid, rejects = validate_numeric_ranges(valid_sample_data)
@@ -152,4 +155,198 @@ class TestRemoveDuplicates:
         assert set(result['location_id'].values) == {'A', 'B', 'C'}
         
         assert result[result['location_id'] == 'A'].iloc[0]['value'] == 1 
-        assert result[result['location_id'] == 'B'].iloc[0]['value'] == 2 
\ No newline at end of file
+        assert result[result['location_id'] == 'B'].iloc[0]['value'] == 2
+
+
+class TestSplitByRules:
+    
+    def test_first_failing_rule_wins(self):
+        df = pd.DataFrame({
+            'location_id': ['CT001', None, 'CT003', 'CT004'],
+            'city': ['Hartford', None, '', 'Bridgeport']
+        })
+        rules = [
+            ('Missing location_id', df['location_id'].isna()),
+            ('Missing or empty city', df['city'].isna() | (df['city'].str.strip() == '')),
+        ]
+        
+        valid, rejected = split_by_rules(df, rules)
+        
+        assert valid['location_id'].tolist() == ['CT001', 'CT004']
+        assert valid.index.tolist() == [0, 3]
+        # Row 1 fails both rules but is only rejected once, for the first one
+        assert rejected.to_frame()['location_id'].tolist()[1:] == ['CT003']
+        assert rejected.to_frame()['rejection_reason'].tolist() == ['Missing location_id', 'Missing or empty city']
+        
+    def test_rejects_grouped_by_rule_order(self):
+        df = pd.DataFrame({'a': [None, 1, None, 1], 'b': [1, None, 1, None]})
+        rules = [('b is null', df['b'].isna()), ('a is null', df['a'].isna())]
+        
+        valid, rejected = split_by_rules(df, rules)
+        
+        assert len(valid) == 0
+        assert rejected.to_frame()['rejection_reason'].tolist() == ['b is null', 'b is null', 'a is null', 'a is null']
+        
+    def test_no_rules(self, valid_sample_data):
+        valid, rejected = split_by_rules(valid_sample_data, [])
+        
+        assert len(valid) == 3
+        assert len(rejected) == 0
+
+
+class TestRejectSet:
+    
+    def test_rejects_are_positions_and_int8_codes(self):
+        df = pd.DataFrame({'location_id': ['CT001', None, 'CT003'], 'city': ['Hartford', 'Stamford', None]})
+        rules = [('Missing location_id', df['location_id'].isna()), ('Missing or empty city', df['city'].isna())]
+        
+        valid, rejected = split_by_rules(df, rules)
+        
+        assert rejected.df is df
+        assert rejected.positions.tolist() == [1, 2]
+        assert rejected.codes.dtype == 'int8'
+        assert rejected.codes.tolist() == [reason_code('Missing location_id'), reason_code('Missing or empty city')]
+        
+    def test_registry_maps_codes_to_text(self):
+        code = reason_code('Missing or empty state')
+        
+        assert reason_code('Missing or empty state') == code
+        assert REJECTION_REASONS[code] == 'Missing or empty state'
+        # Reasons built at runtime get the next free code
+        new_code = reason_code('Registry test reason')
+        assert REJECTION_REASONS[new_code] == 'Registry test reason'
+        
+    def test_reason_counts_follow_rule_order(self):
+        df = pd.DataFrame({'a': [None, 1, None, 1], 'b': [1, None, 1, None]})
+        rules = [('b is null', df['b'].isna()), ('a is null', df['a'].isna())]
+        
+        valid, rejected = split_by_rules(df, rules)
+        
+        assert list(rejected.reason_counts().items()) == [('b is null', 2), ('a is null', 2)]
+        
+    def test_to_frame_slice(self):
+        df = pd.DataFrame({'location_id': [None, None, None], 'city': ['A', 'B', 'C']}, index=[10, 11, 12])
+        
+        valid, rejected = split_by_rules(df, [('Missing location_id', df['location_id'].isna())])
+        page = rejected.to_frame(1, 3)
+        
+        assert page['city'].tolist() == ['B', 'C']
+        assert page.index.tolist() == [0, 1]
+        assert (page['rejection_reason'] == 'Missing location_id').all()
+
+
+class TestCompileRules:
+    
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame({
+            'location_id': ['CT001', 'CT002', 'CT003', 'CT004', None],
+            'state': ['CT', ' ', 'CTX', 'MA', 'CT'],
+            'zip_code': ['06103', '6103', None, '02108', '06103'],
+            'parking_spaces': pd.array([5, -1, None, 400, 5], dtype='Int16')
+        })
+    
+    def masks(self, df, declarations):
+        return {reason: mask.tolist() for reason, mask in compile_rules(declarations).evaluate(df)}
+    
+    def test_every_check(self, df):
+        masks = self.masks(df, [
+            {'column': 'location_id', 'check': 'not_null'},
+            {'column': 'state', 'check': 'non_empty'},
+            {'column': 'state', 'check': 'length', 'max': 2},
+            {'column': 'state', 'check': 'in', 'values': ['CT', 'MA'], 'reason': 'Unknown state'},
+            {'column': 'zip_code', 'check': 'regex', 'pattern': r'\d{5}'},
+            {'column': 'parking_spaces', 'check': 'range', 'min': 0, 'max': 300},
+        ])
+        
+        assert masks == {
+            'NULL value in location_id': [False, False, False, False, True],
+            'Missing or empty state': [False, True, False, False, False],
+            'Invalid state length': [False, False, True, False, False],
+            'Unknown state': [False, True, True, False, False],
+            # Missing values only fail not_null / non_empty
+            'Invalid zip_code format': [False, True, False, False, False],
+            'parking_spaces out of range': [False, True, False, True, False],
+        }
+        
+    def test_categorical_column(self, df):
+        df['state'] = df['state'].astype('category')
+        
+        masks = self.masks(df, [{'column': 'state', 'check': 'in', 'values': ['CT', 'MA']}])
+        
+        assert masks['Unexpected state value'] == [False, True, True, False, False]
+        
+    def test_each_distinct_value_checked_once(self):
+        df = pd.DataFrame({'state': ['CT', 'MA', None] * 1000})
+        plan = compile_rules([{'column': 'state', 'check': 'length', 'min': 2}])
+        checked = []
+        invalid = plan.rules[0].invalid
+        plan.rules[0].invalid = lambda values: checked.append(len(values)) or invalid(values)
+        
+        plan.evaluate(df)
+        
+        assert checked == [2]
+        
+    def test_missing_columns_are_skipped(self, df):
+        plan = compile_rules([{'column': 'city', 'check': 'not_null'}, {'column': 'state', 'check': 'not_null'}])
+        
+        assert [reason for reason, _ in plan.evaluate(df)] == ['NULL value in state']
+        
+    @pytest.mark.parametrize('declaration, message', [
+        ({'column': 'state', 'check': 'shorter_than'}, 'Unknown validation check'),
+        ({'column': 'state', 'check': 'regex'}, 'needs a pattern'),
+        ({'column': 'state', 'check': 'in'}, 'needs values'),
+        ({'column': 'parking_spaces', 'check': 'range'}, 'needs min or max'),
+    ])
+    def test_invalid_declarations(self, declaration, message):
+        with pytest.raises(ValueError, match=message):
+            compile_rules([declaration])
+            
+    def test_reasons_registered(self):
+        plan = compile_rules([{'column': 'county', 'check': 'non_empty'}])
+        
+        assert REJECTION_REASONS[reason_code('Missing or empty county')] == plan.rules[0].reason
+
+
+class TestValidationPlan:
+    
+    def test_stage_per_rule_column(self, valid_sample_data):
+        report = metrics.start_run()
+        
+        DEFAULT_PLAN.evaluate(valid_sample_data)
+        metrics.finish_run()
+        
+        # Columns missing from the frame are not evaluated, so they get no stage
+        assert [(record['stage'], record['rules']) for record in report.stages] == [
+            ('validate.column.location_id', 1), ('validate.column.city', 1),
+            ('validate.column.state', 1), ('validate.column.parking_spaces', 1)
+        ]
+    
+    def test_built_in_rules_without_config(self):
+        assert validation_plan({'name': 'feed'}) is DEFAULT_PLAN
+        assert [rule.reason for rule in DEFAULT_PLAN.rules][:4] == [
+            'Missing location_id', 'Missing or empty city', 'Missing or empty state', 'Negative parking_spaces'
+        ]
+        
+    def test_source_rules_replace_or_extend_defaults(self):
+        rules = [{'column': 'state', 'check': 'length', 'min': 2, 'max': 2}]
+        
+        own = validation_plan({'validation': {'rules': rules}})
+        extended = validation_plan({'validation': {'rules': rules, 'use_defaults': True}})
+        
+        assert len(own) == 1
+        assert len(extended) == len(DEFAULT_PLAN) + 1
+        assert extended.rules[-1].reason == 'Invalid state length'
+        
+    def test_shipped_config_declares_the_built_in_rules(self):
+        # The shipped source spells out today's checks instead of relying on use_defaults
+        config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'sources.json')
+        with open(config_path) as f:
+            source_config = json.load(f)['sources'][0]
+        
+        plan = validation_plan(source_config)
+        
+        assert 'use_defaults' not in source_config['validation']
+        assert [(rule.column, rule.check, rule.reason, rule.options) for rule in plan.rules] == [
+            (rule.column, rule.check, rule.reason, rule.options) for rule in DEFAULT_PLAN.rules
+        ]